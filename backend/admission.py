@@ -0,0 +1,192 @@
+"""
+Admission control: keep one client, or one kind of expensive work, from
+raising latency for every route.
+
+- Rate limits (429 + Retry-After): token buckets per IP for every request, per
+  user for every authenticated request, and tighter per-route buckets for
+  login / register (bcrypt), guest creation (a users row per call) and PDF
+  reports. Buckets are per process; with N workers a client gets up to N times
+  the rate. The IP is the ASGI client address, so behind a proxy run uvicorn
+  with --proxy-headers and FORWARDED_ALLOW_IPS set to the proxy.
+- Pools: bcrypt (passwords.py) and PDF rendering (routers/reports.py) each run
+  behind a concurrency limit with a bounded wait queue; once the queue is full,
+  new work gets 503 + Retry-After instead of waiting behind it.
+- Load shedding: past MAX_INFLIGHT requests in this process, new requests get
+  503 + Retry-After straight away (/health and /metrics are never shed).
+"""
+from typing import Optional, Tuple
+import asyncio
+import math
+import os
+import time
+
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+
+from auth import token_user_id
+from cache import TTLCache
+import metrics
+
+RATE_LIMIT = os.getenv("RATE_LIMIT", "1") == "1"
+RATE_LIMIT_USER_RPS = float(os.getenv("RATE_LIMIT_USER_RPS", "10"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "40"))
+RATE_LIMIT_IP_RPS = float(os.getenv("RATE_LIMIT_IP_RPS", "20"))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "100"))
+RATE_LIMIT_LOGIN_PER_MIN = float(os.getenv("RATE_LIMIT_LOGIN_PER_MIN", "10"))
+RATE_LIMIT_GUEST_PER_MIN = float(os.getenv("RATE_LIMIT_GUEST_PER_MIN", "10"))
+RATE_LIMIT_PDF_PER_MIN = float(os.getenv("RATE_LIMIT_PDF_PER_MIN", "6"))
+RATE_LIMIT_KEYS = int(os.getenv("RATE_LIMIT_KEYS", "100000"))
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", "256"))  # 0 = no load shedding
+# A rate of 0 turns that limit off
+SHED_RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", "2"))
+
+# (method, path) -> (bucket name, requests per minute, keyed by "ip" or "user")
+ROUTE_LIMITS = {
+    route: rule for route, rule in {
+        ("POST", "/api/auth/login"): ("login", RATE_LIMIT_LOGIN_PER_MIN, "ip"),
+        ("POST", "/api/auth/register"): ("login", RATE_LIMIT_LOGIN_PER_MIN, "ip"),
+        ("POST", "/api/auth/guest"): ("guest", RATE_LIMIT_GUEST_PER_MIN, "ip"),
+        ("GET", "/api/reports/pdf"): ("pdf", RATE_LIMIT_PDF_PER_MIN, "user"),
+        ("POST", "/api/reports/pdf/jobs"): ("pdf", RATE_LIMIT_PDF_PER_MIN, "user"),
+    }.items()
+    if rule[1] > 0
+}
+UNLIMITED_PATHS = {"/health", "/metrics"}
+
+RATE_LIMITED_DETAIL = "リクエストが多すぎます。しばらく待ってから再度お試しください"
+OVERLOADED_DETAIL = "サーバーが混み合っています。しばらく待ってから再度お試しください"
+
+
+class TokenBuckets:
+    """Token buckets by key, in a bounded LRU; a bucket idle long enough to refill is dropped."""
+
+    def __init__(self, max_keys: int):
+        self._buckets = TTLCache(maxsize=max_keys)
+
+    def take(self, key: Tuple, rate: float, burst: float) -> float:
+        """Spend one token; returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - last) * rate)
+        if tokens < 1:
+            self._buckets.set(key, (tokens, now), ttl=(burst - tokens) / rate)
+            return (1 - tokens) / rate
+        self._buckets.set(key, (tokens - 1, now), ttl=(burst - tokens + 1) / rate)
+        return 0.0
+
+
+buckets = TokenBuckets(RATE_LIMIT_KEYS)
+# token -> user id, so the limiter does not verify the JWT signature on every request
+_token_users = TTLCache(maxsize=10000, ttl=300)
+
+
+def _user_id(headers: Headers) -> Optional[int]:
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    user_id = _token_users.get(token)
+    if user_id is None:
+        user_id = token_user_id(token)  # None: the route's auth dependency answers 401
+        if user_id is not None:
+            _token_users.set(token, user_id)
+    return user_id
+
+
+def overloaded(retry_after: float, reason: str) -> HTTPException:
+    metrics.admission_rejected.inc((reason,))
+    return HTTPException(
+        status_code=503, detail=OVERLOADED_DETAIL, headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+
+class Pool:
+    """Concurrency limit for one kind of expensive work, with a bounded wait queue.
+
+    `async with pool:` around the work, or acquire() / release() when the work
+    outlives the request. Raises 503 when `max_queue` callers are already waiting.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, retry_after: float):
+        self.name, self.max_queue, self.retry_after = name, max_queue, retry_after
+        self._semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+
+    async def acquire(self) -> None:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise overloaded(self.retry_after, f"pool:{self.name}")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware: load shedding, then the rate limits, before any routing."""
+
+    def __init__(self, app):
+        self.app = app
+        self.inflight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNLIMITED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        if MAX_INFLIGHT and self.inflight >= MAX_INFLIGHT:
+            metrics.admission_rejected.inc(("shed",))
+            await self._reject(scope, receive, send, 503, OVERLOADED_DETAIL, SHED_RETRY_AFTER)
+            return
+        if RATE_LIMIT:
+            limited = self._rate_limit(scope)
+            if limited is not None:
+                reason, wait = limited
+                metrics.admission_rejected.inc((f"rate:{reason}",))
+                await self._reject(scope, receive, send, 429, RATE_LIMITED_DETAIL, wait)
+                return
+
+        self.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
+
+    @staticmethod
+    def _rate_limit(scope) -> Optional[Tuple[str, float]]:
+        """(bucket name, seconds to wait) for the first exhausted bucket, or None."""
+        ip = (scope.get("client") or ("-",))[0]
+        user_id = _user_id(Headers(scope=scope))
+        rule = ROUTE_LIMITS.get((scope["method"], scope["path"]))
+        if rule is not None:
+            name, per_min, keyed_by = rule
+            key = ip if keyed_by == "ip" else user_id
+            if key is not None:
+                wait = buckets.take((name, key), per_min / 60, per_min)
+                if wait:
+                    return name, wait
+        if RATE_LIMIT_IP_RPS > 0:
+            wait = buckets.take(("ip", ip), RATE_LIMIT_IP_RPS, RATE_LIMIT_IP_BURST)
+            if wait:
+                return "ip", wait
+        if user_id is not None and RATE_LIMIT_USER_RPS > 0:
+            wait = buckets.take(("user", user_id), RATE_LIMIT_USER_RPS, RATE_LIMIT_USER_BURST)
+            if wait:
+                return "user", wait
+        return None
+
+    @staticmethod
+    async def _reject(scope, receive, send, status: int, detail: str, retry_after: float) -> None:
+        response = ORJSONResponse(
+            {"detail": detail}, status_code=status, headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+        await response(scope, receive, send)
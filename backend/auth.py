@@ -1,29 +1,51 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
+import time
 
-from database import get_db
+from cache import TTLCache
+from database import get_async_db
+from scoring import age_bracket
 import models
 
 SECRET_KEY = os.getenv("SECRET_KEY", "pbcm-secret-key-change-in-production-2024")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# user_id -> (as of, AuthUser); wins over the claims of tokens issued before it, so profile
+# edits apply to older tokens, while a newer token (e.g. re-issued by another worker) wins
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
 
+@dataclass(frozen=True)
+class AuthUser:
+    """Authenticated identity resolved from signed token claims, without a DB hit."""
+    id: int
+    is_guest: bool
+    age_bracket: str
+    language: str
+    gender: Optional[str] = None
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    @classmethod
+    def from_user(cls, user: models.User) -> "AuthUser":
+        return cls(
+            id=user.id,
+            is_guest=bool(user.is_guest),
+            age_bracket=age_bracket(user.age),
+            language=user.language or "ja",
+            gender=user.gender,
+        )
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -33,7 +55,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def create_user_token(user: models.User) -> str:
+    """Issue a token carrying the claims AuthUser needs, and refresh the user cache."""
+    auth_user = AuthUser.from_user(user)
+    issued_at = time.time()
+    user_cache.set(auth_user.id, (issued_at, auth_user))
+    return create_access_token({
+        "sub": str(auth_user.id),
+        "iat": issued_at,
+        "guest": auth_user.is_guest,
+        "age": auth_user.age_bracket,
+        "lang": auth_user.language,
+        "gender": auth_user.gender,
+    })
+
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.invalidate(user_id)
+
+
+def _decode_token(token: str) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="認証情報が無効です",
@@ -41,13 +82,62 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+        payload["sub"] = int(payload["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
         raise credentials_exception
+    return payload
+
+
+def token_user_id(token: str) -> Optional[int]:
+    """User id of a valid token, or None."""
+    try:
+        return _decode_token(token)["sub"]
+    except HTTPException:
+        return None
 
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> AuthUser:
+    payload = _decode_token(token)
+    user_id = payload["sub"]
+
+    cached = user_cache.get(user_id)
+    if cached is not None and cached[0] >= payload.get("iat", 0):
+        return cached[1]
+    if "age" in payload and "lang" in payload:
+        return AuthUser(
+            id=user_id,
+            is_guest=bool(payload.get("guest")),
+            age_bracket=payload["age"],
+            language=payload["lang"],
+            gender=payload.get("gender"),
+        )
+
+    # Tokens issued before claims were added: resolve once and cache
+    user = await get_current_user_record(token, db)
+    return AuthUser.from_user(user)
+
+
+async def get_current_user_record(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> models.User:
+    """Full users row, for endpoints that need fields beyond the token claims."""
+    payload = _decode_token(token)
+    user = await db.scalar(select(models.User).where(models.User.id == payload["sub"]))
+    if user is None and payload["sub"] < 0 and payload.get("guest"):
+        # GUEST_MODE=memory guest with nothing saved yet: a transient row, not added to the
+        # session; writers persist it with guests.ensure_persisted (e.g. the profile edit)
+        from guests import new_guest
+
+        user = new_guest(payload["sub"], payload.get("lang") or "ja")
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="認証情報が無効です",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user_cache.set(user.id, (time.time(), AuthUser.from_user(user)))
     return user
@@ -0,0 +1,285 @@
+"""
+Vectorized rescoring of the whole score history.
+
+Reads survey_responses and scores as columnar NumPy arrays, recomputes every
+pillar and total score with the same arithmetic as scoring.py (including the
+weekly carry-forward of health/skills), and writes changed rows back in bulk.
+Run it after changing REVERSE_ITEMS, weights or normalization ranges:
+
+    cd backend && python -m batch_scoring [--dry-run] [--verify 1000]
+"""
+from typing import Dict, List, Optional
+import argparse
+import shutil
+import time
+
+import numpy as np
+from sqlalchemy import String, cast, select, update
+
+from database import SessionLocal
+from population_stats import population
+from scoring import (
+    LIKERT_RANGE, PHQ_GAD_ITEMS, PHQ_GAD_RANGE, REVERSE_ITEMS, STRESS_ITEM, STRESS_RANGE,
+    calculate_pillar1_score, calculate_pillar2_score, calculate_pillar3_score, total_score,
+)
+import models
+
+PILLARS = ("drivers", "health", "skills")
+SCORE_COLUMNS = ("pillar1_score", "pillar2_score", "pillar3_score", "total_score")
+
+
+def round1(x: np.ndarray) -> np.ndarray:
+    """round(x, 1) element-wise, matching Python's correctly-rounded result."""
+    r = np.round(x, 1)
+    # np.round scales by 10 first; redo values sitting on a .x5 tie with Python's round()
+    t = x * 10
+    tie = np.abs(t - np.floor(t) - 0.5) < 1e-6
+    if tie.any():
+        r[tie] = [round(v, 1) for v in x[tie].tolist()]
+    return r
+
+
+def _forward(raw: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    # Same operations, in the same order, as scoring.normalize_score
+    return np.clip(((raw - lo) / (hi - lo)) * 100, 0, 100)
+
+
+def _inverted(raw: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    return np.clip((1 - (raw - lo) / (hi - lo)) * 100, 0, 100)
+
+
+def normalize_items(pillar: np.ndarray, item_id: np.ndarray, raw: np.ndarray) -> np.ndarray:
+    """Per-item 0-100 normalization for all responses at once (see scoring.py)."""
+    lo, hi = LIKERT_RANGE
+    forward = _forward(raw, lo, hi)
+    reverse = _forward(hi - raw + lo, lo, hi)
+    phq_gad = _inverted(raw, *PHQ_GAD_RANGE)
+    stress = _inverted(raw, *STRESS_RANGE)
+
+    items, item_code = np.unique(item_id, return_inverse=True)
+    is_reverse = np.isin(items, list(REVERSE_ITEMS))[item_code]
+    is_phq_gad = np.isin(items, list(PHQ_GAD_ITEMS))[item_code]
+    is_stress = (items == STRESS_ITEM)[item_code]
+
+    drivers = np.where(is_reverse, reverse, forward)
+    health = np.where(is_phq_gad, phq_gad, np.where(is_stress, stress, reverse))
+    return np.select([pillar == 0, pillar == 1], [drivers, health], default=forward)
+
+
+def load_scores(db, chunk_size: int) -> Dict[str, np.ndarray]:
+    """All scores ordered by (user, date, id): the order carry-forward follows."""
+    stmt = (
+        select(
+            models.Score.id, models.Score.user_id, cast(models.Score.date, String),
+            models.Score.survey_type, *(getattr(models.Score, c) for c in SCORE_COLUMNS),
+        )
+        .order_by(models.Score.user_id, models.Score.date, models.Score.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    rows = [r for part in db.execute(stmt).partitions() for r in part]
+    cols = list(zip(*rows)) or [()] * (4 + len(SCORE_COLUMNS))
+    out = {
+        "id": np.array(cols[0], dtype=np.int64),
+        "user_id": np.array(cols[1], dtype=np.int64),
+        "date": np.array(cols[2], dtype=object),
+        "weekly": np.array([t == "weekly" for t in cols[3]], dtype=bool),
+    }
+    for i, c in enumerate(SCORE_COLUMNS):
+        out[c] = np.array([np.nan if v is None else v for v in cols[4 + i]], dtype=np.float64)
+    return out
+
+
+def load_responses(db, chunk_size: int) -> Dict[str, np.ndarray]:
+    stmt = (
+        select(
+            models.SurveyResponse.user_id, cast(models.SurveyResponse.timestamp, String),
+            models.SurveyResponse.pillar, models.SurveyResponse.item_id,
+            models.SurveyResponse.score,
+        )
+        .order_by(models.SurveyResponse.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    user_id, ts, pillar, item_id, raw = [], [], [], [], []
+    for part in db.execute(stmt).partitions():
+        cols = list(zip(*part))
+        user_id.append(np.array(cols[0], dtype=np.int64))
+        ts.append(np.array(cols[1], dtype=object))
+        pillar.append(np.array([PILLARS.index(p) if p in PILLARS else 2 for p in cols[2]], dtype=np.int8))
+        item_id.append(np.array(cols[3], dtype=object))
+        raw.append(np.array(cols[4], dtype=np.float64))
+
+    def cat(parts, dtype):
+        return np.concatenate(parts) if parts else np.array([], dtype=dtype)
+
+    return {
+        "user_id": cat(user_id, np.int64),
+        "timestamp": cat(ts, object),
+        "pillar": cat(pillar, np.int8),
+        "item_id": cat(item_id, object),
+        "score": cat(raw, np.float64),
+    }
+
+
+def match_responses(scores: Dict, responses: Dict) -> np.ndarray:
+    """Index of the score row each response belongs to (same user and timestamp), or -1."""
+    n = len(scores["id"])
+    if n == 0 or len(responses["score"]) == 0:
+        return np.full(len(responses["score"]), -1, dtype=np.int64)
+    stamps, code = np.unique(
+        np.concatenate([scores["date"], responses["timestamp"]]).astype(str), return_inverse=True
+    )
+    score_key = scores["user_id"] * len(stamps) + code[:n]
+    resp_key = responses["user_id"] * len(stamps) + code[n:]
+    order = np.argsort(score_key, kind="stable")
+    pos = np.searchsorted(score_key[order], resp_key)
+    pos = np.minimum(pos, n - 1)
+    idx = order[pos]
+    return np.where(score_key[idx] == resp_key, idx, -1)
+
+
+def rescore(scores: Dict, responses: Dict, score_idx: np.ndarray) -> Dict[str, np.ndarray]:
+    n = len(scores["id"])
+    matched = score_idx >= 0
+    normalized = normalize_items(responses["pillar"], responses["item_id"], responses["score"])
+
+    slot = score_idx[matched] * 3 + responses["pillar"][matched]
+    sums = np.bincount(slot, weights=normalized[matched], minlength=n * 3).reshape(n, 3)
+    counts = np.bincount(slot, minlength=n * 3).reshape(n, 3)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        own = np.where(counts > 0, round1(np.clip(sums / counts, 0, 100)), np.nan)
+
+    # Rows with no stored responses cannot be rescored; keep what they have
+    has_responses = counts.sum(axis=1) > 0
+    stored = np.column_stack([scores[c] for c in SCORE_COLUMNS[:3]])
+    own = np.where(has_responses[:, None], own, stored)
+
+    # Weekly rows carry health/skills forward from the user's previous score
+    first_of_user = np.ones(n, dtype=bool)
+    first_of_user[1:] = scores["user_id"][1:] != scores["user_id"][:-1]
+    result = {"pillar1_score": own[:, 0]}
+    for col, name in ((1, "pillar2_score"), (2, "pillar3_score")):
+        anchor = ~np.isnan(own[:, col]) | ~scores["weekly"] | first_of_user | ~has_responses
+        source = np.maximum.accumulate(np.where(anchor, np.arange(n), 0))
+        result[name] = own[source, col]
+
+    p1, p2, p3 = result["pillar1_score"], result["pillar2_score"], result["pillar3_score"]
+    result["total_score"] = round1(0.3 * p1 + 0.4 * p2 + 0.3 * p3)
+    result["changed"] = np.zeros(n, dtype=bool)
+    for c in SCORE_COLUMNS:
+        old, new = scores[c], result[c]
+        result["changed"] |= ~((old == new) | (np.isnan(old) & np.isnan(new)))
+    return result
+
+
+def verify(scores: Dict, responses: Dict, score_idx: np.ndarray, result: Dict, sample: int) -> int:
+    """Recompute a random sample of rows with the scalar functions; returns mismatches."""
+    n = len(scores["id"])
+    candidates = np.unique(score_idx[score_idx >= 0])
+    if n == 0 or len(candidates) == 0:
+        return 0
+    rng = np.random.default_rng(0)
+    picked = rng.choice(candidates, size=min(sample, len(candidates)), replace=False)
+    in_sample = np.isin(score_idx, picked)
+    per_row: Dict[int, List[Dict[str, float]]] = {int(i): [{}, {}, {}] for i in picked}
+    for i, p, item, raw in zip(
+        score_idx[in_sample], responses["pillar"][in_sample],
+        responses["item_id"][in_sample], responses["score"][in_sample],
+    ):
+        per_row[int(i)][int(p)][item] = float(raw)
+
+    def value(x) -> Optional[float]:
+        return None if np.isnan(x) else float(x)
+
+    mismatches = 0
+    for i, (drivers, health, skills) in per_row.items():
+        p1 = calculate_pillar1_score(drivers) if drivers else None
+        p2 = calculate_pillar2_score(health) if health else None
+        p3 = calculate_pillar3_score(skills, {}) if skills else None
+        same_user = i > 0 and scores["user_id"][i - 1] == scores["user_id"][i]
+        if scores["weekly"][i] and same_user:
+            if p2 is None:
+                p2 = value(result["pillar2_score"][i - 1])
+            if p3 is None:
+                p3 = value(result["pillar3_score"][i - 1])
+        t = total_score(p1, p2, p3) if None not in (p1, p2, p3) else None
+        expected = (p1, p2, p3, t)
+        got = tuple(value(result[c][i]) for c in SCORE_COLUMNS)
+        if expected != got:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  mismatch score id={scores['id'][i]}: scalar={expected} vector={got}")
+    return mismatches
+
+
+def write_back(db, scores: Dict, result: Dict, chunk_size: int) -> int:
+    def value(x) -> Optional[float]:
+        return None if np.isnan(x) else float(x)
+
+    changed = np.flatnonzero(result["changed"])
+    for start in range(0, len(changed), chunk_size):
+        rows = changed[start:start + chunk_size]
+        db.execute(update(models.Score), [
+            {"id": int(scores["id"][i]), **{c: value(result[c][i]) for c in SCORE_COLUMNS}}
+            for i in rows
+        ])
+
+    # The newest row per user feeds user_latest_score
+    n = len(scores["id"])
+    last_of_user = np.ones(n, dtype=bool)
+    last_of_user[:-1] = scores["user_id"][:-1] != scores["user_id"][1:]
+    latest = np.flatnonzero(last_of_user & result["changed"])
+    for start in range(0, len(latest), chunk_size):
+        rows = latest[start:start + chunk_size]
+        db.execute(update(models.UserLatestScore), [
+            {
+                "user_id": int(scores["user_id"][i]),
+                "score_id": int(scores["id"][i]),
+                **{c: value(result[c][i]) for c in SCORE_COLUMNS},
+            }
+            for i in rows
+        ])
+    db.commit()
+    return len(changed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rescore all survey history in bulk.")
+    parser.add_argument("--dry-run", action="store_true", help="compute and report, write nothing")
+    parser.add_argument("--verify", type=int, default=0, metavar="N",
+                        help="check N random rows against the scalar scoring functions")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        scores = load_scores(db, args.chunk_size)
+        responses = load_responses(db, args.chunk_size)
+        t1 = time.perf_counter()
+        score_idx = match_responses(scores, responses)
+        result = rescore(scores, responses, score_idx)
+        t2 = time.perf_counter()
+        print(f"loaded {len(responses['score']):,} responses / {len(scores['id']):,} scores "
+              f"in {t1 - t0:.2f}s, rescored in {t2 - t1:.2f}s, "
+              f"{int(result['changed'].sum()):,} rows changed")
+
+        if args.verify:
+            bad = verify(scores, responses, score_idx, result, args.verify)
+            print(f"verify: {bad} mismatches in {min(args.verify, len(scores['id']))} sampled rows")
+            if bad:
+                raise SystemExit(1)
+
+        if not args.dry_run and result["changed"].any():
+            written = write_back(db, scores, result, args.chunk_size)
+            print(f"wrote {written:,} rows in {time.perf_counter() - t2:.2f}s")
+            population.rebuild(db, args.chunk_size)
+            # Rescored totals give reports new job ids; drop the files rendered from the old ones
+            from routers.reports import PDF_CACHE_DIR
+            for user_id in np.unique(scores["user_id"][result["changed"]]):
+                shutil.rmtree(PDF_CACHE_DIR / str(int(user_id)), ignore_errors=True)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
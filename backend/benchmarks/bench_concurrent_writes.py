@@ -0,0 +1,93 @@
+"""
+Concurrent write throughput: many users submitting baseline surveys at once
+through the real app (in-process ASGI), against whatever DATABASE_URL points at.
+
+    cd backend && python -m benchmarks.bench_concurrent_writes --users 50 --rounds 10
+    cd backend && python -m benchmarks.bench_concurrent_writes --rollback-journal   # pre-WAL settings
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_concurrent_writes
+
+Run each configuration with DB_MODE=async and DB_MODE=sync to compare drivers.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50, help="concurrent clients")
+    parser.add_argument("--rounds", type=int, default=10, help="submissions per client")
+    parser.add_argument("--rollback-journal", action="store_true",
+                        help="SQLite only: disable WAL and the single-writer queue")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+if args.rollback_journal:
+    os.environ.update(SQLITE_WAL="0", SQLITE_SINGLE_WRITER="0")
+
+import httpx  # noqa: E402
+
+from database import Base, DB_MODE, engine  # noqa: E402
+import main as app_module  # noqa: E402
+
+SURVEY = {
+    "survey_type": "baseline",
+    "drivers": {f"d{i}": 3 for i in range(1, 11)},
+    "health": {f"h{i}": 1 for i in range(1, 11)},
+    "skills_survey": {f"s{i}": 4 for i in range(1, 11)},
+}
+
+
+async def post(client: httpx.AsyncClient, errors: list, url: str, **kw):
+    try:
+        r = await client.post(url, **kw)
+    except Exception as exc:  # "database is locked" surfaces as an app exception
+        errors.append(type(exc).__name__)
+        return None
+    if r.status_code != 200:
+        errors.append(r.status_code)
+        return None
+    return r
+
+
+async def client_run(client: httpx.AsyncClient, rounds: int, latencies: list, errors: list) -> None:
+    r = await post(client, errors, "/api/auth/guest", json={"language": "ja"})
+    if r is None:
+        return
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    for _ in range(rounds):
+        start = time.perf_counter()
+        if await post(client, errors, "/api/surveys/submit-batch", json=SURVEY, headers=headers):
+            latencies.append(time.perf_counter() - start)
+
+
+async def run() -> None:
+    Base.metadata.create_all(bind=engine)
+    latencies, errors = [], []
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client_run(client, args.rounds, latencies, errors) for _ in range(args.users)
+        ))
+        elapsed = time.perf_counter() - start
+
+    print(f"{engine.url} | DB_MODE={DB_MODE} | {args.users} clients x {args.rounds} submissions")
+    if latencies:
+        q = statistics.quantiles(latencies, n=100)
+        print(f"  {len(latencies) / elapsed:>8,.0f} submissions/sec   "
+              f"p50 {q[49] * 1000:.1f} ms   p95 {q[94] * 1000:.1f} ms   p99 {q[98] * 1000:.1f} ms")
+    print(f"  ok {len(latencies)}   errors {len(errors)} {sorted(set(map(str, errors)))[:5]}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
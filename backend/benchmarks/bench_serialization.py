@@ -0,0 +1,138 @@
+"""
+Cost of one 1,000-row /surveys/history payload, per serialization path:
+
+- before:    ORM objects -> isoformat() dicts -> jsonable_encoder -> json.dumps
+- orjson:    ORM objects -> score_to_dict -> serialization.dumps
+- rows_json: Core rows of just SCORE_FIELDS -> serialization.rows_json (the endpoint)
+
+"encode" times serialization alone on already-loaded rows; "fetch+encode"
+includes the SQLite query in a fresh session, as a request would.
+
+    cd backend && python -m benchmarks.bench_serialization [rows] [repeats]
+"""
+from datetime import datetime, timedelta
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from database import Base, SessionLocal, engine  # noqa: E402
+from routers.surveys import SCORE_FIELDS, score_to_dict  # noqa: E402
+from serialization import dumps, rows_json  # noqa: E402
+import models  # noqa: E402
+
+
+def seed(n_rows: int) -> int:
+    db = SessionLocal()
+    try:
+        user = models.User(email="bench_serialization@pbcm.local", is_guest=True)
+        db.add(user)
+        db.commit()
+        start = datetime(2020, 1, 6, 8, 30, 15, 250000)
+        db.execute(insert(models.Score), [
+            {"user_id": user.id, "date": start + timedelta(days=7 * i, seconds=i),
+             "survey_type": "baseline" if i == 0 else "weekly",
+             "pillar1_score": 40 + i % 50 + 0.5, "pillar2_score": 60.3, "pillar3_score": None if i % 9 else 71.2,
+             "total_score": None if i % 9 else 55.1}
+            for i in range(n_rows)
+        ])
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def old_score_to_dict(s: models.Score) -> dict:
+    return {
+        "id": s.id,
+        "date": s.date.isoformat(),
+        "survey_type": s.survey_type,
+        "pillar1_score": s.pillar1_score,
+        "pillar2_score": s.pillar2_score,
+        "pillar3_score": s.pillar3_score,
+        "total_score": s.total_score,
+    }
+
+
+def encode_before(scores) -> bytes:
+    return json.dumps(
+        jsonable_encoder([old_score_to_dict(s) for s in scores]),
+        ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def encode_orjson(scores) -> bytes:
+    return dumps([score_to_dict(s) for s in scores])
+
+
+def encode_rows(rows) -> bytes:
+    return rows_json(rows, SCORE_FIELDS)
+
+
+def fetch_orm(db, user_id: int):
+    return db.scalars(select(models.Score).where(models.Score.user_id == user_id).order_by(models.Score.date)).all()
+
+
+def fetch_rows(db, user_id: int):
+    table = models.Score.__table__
+    return db.execute(
+        select(*(table.c[f] for f in SCORE_FIELDS)).where(table.c.user_id == user_id).order_by(table.c.date)
+    ).all()
+
+
+CASES = (
+    ("before", fetch_orm, encode_before),
+    ("orjson", fetch_orm, encode_orjson),
+    ("rows_json", fetch_rows, encode_rows),
+)
+
+
+def best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    Base.metadata.create_all(bind=engine)
+    user_id = seed(n_rows)
+
+    reference = None
+    print(f"{n_rows} rows, best of {repeats}")
+    print(f"  {'path':<10} {'encode':>10} {'fetch+encode':>14} {'bytes':>9}")
+    for name, fetch, encode in CASES:
+        db = SessionLocal()
+        try:
+            rows = fetch(db, user_id)
+            body = encode(rows)
+            encode_s = best_of(lambda: encode(rows), repeats)
+        finally:
+            db.close()
+
+        def request():
+            with SessionLocal() as session:
+                encode(fetch(session, user_id))
+
+        total_s = best_of(request, repeats)
+        # Every path must produce the same document
+        parsed = json.loads(body)
+        if reference is None:
+            reference = parsed
+        elif parsed != reference:
+            raise SystemExit(f"{name}: payload differs from 'before'")
+        print(f"  {name:<10} {encode_s * 1e3:>8.2f}ms {total_s * 1e3:>12.2f}ms {len(body):>9,}")
+
+
+if __name__ == "__main__":
+    main()
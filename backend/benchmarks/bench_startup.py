@@ -0,0 +1,107 @@
+"""
+Cold-start budget: `import main` time (python -X importtime) and wall time from
+launching uvicorn to the first 200 from /health. Exits non-zero when either is
+over budget, or when a module that should load lazily is imported at startup.
+
+    cd backend && python -m benchmarks.bench_startup --import-budget-ms 2000 --health-budget-ms 3000
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+# Only needed by reports, migrations or batch jobs; must not load with the app
+LAZY_MODULES = ("reportlab", "numpy", "alembic", "passlib")
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/startup.db")
+    # Deploys migrate before starting the app; keep that out of the timings
+    subprocess.run([sys.executable, "-m", "migrate"], cwd=BACKEND, env=env,
+                   check=True, capture_output=True)
+    return env
+
+
+def import_times(env: dict) -> dict:
+    """Cumulative import time in microseconds per module for `import main`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_health(env: dict, timeout: float = 30.0) -> float:
+    """Seconds from spawning uvicorn until GET /health returns 200."""
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"/health not ready after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold-start budget check.")
+    parser.add_argument("--import-budget-ms", type=float, default=2000)
+    parser.add_argument("--health-budget-ms", type=float, default=3000)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    args = parser.parse_args()
+    env = _env()
+    failures = []
+
+    times = import_times(env)
+    total_ms = times["main"] / 1000
+    print(f"import main: {total_ms:,.0f} ms (budget {args.import_budget_ms:,.0f})")
+    top_level = {name: us for name, us in times.items() if "." not in name and name != "main"}
+    for name, us in sorted(top_level.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {us / 1000:>8,.1f} ms  {name}")
+    if total_ms > args.import_budget_ms:
+        failures.append("import time over budget")
+    eager = [m for m in LAZY_MODULES if m in times]
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+
+    health_ms = time_to_health(env) * 1000
+    print(f"first /health 200: {health_ms:,.0f} ms (budget {args.health_budget_ms:,.0f})")
+    if health_ms > args.health_budget_ms:
+        failures.append("time to /health over budget")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
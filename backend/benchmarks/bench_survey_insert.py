@@ -0,0 +1,79 @@
+"""
+Rows/sec for saving a 30-item baseline survey: per-row ORM add() vs one
+executemany insert() with the score row in the same transaction.
+
+    cd backend && python -m benchmarks.bench_survey_insert [submissions]
+"""
+from datetime import datetime
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import insert  # noqa: E402
+
+from database import Base, SessionLocal, engine  # noqa: E402
+import models  # noqa: E402
+
+ITEMS = (
+    [("drivers", f"d{i}", 3.0) for i in range(1, 11)]
+    + [("health", f"h{i}", 1.0) for i in range(1, 11)]
+    + [("skills", f"s{i}", 4.0) for i in range(1, 11)]
+)
+
+
+def orm_per_row(db, user_id: int) -> None:
+    now = datetime.utcnow()
+    for pillar, item_id, score in ITEMS:
+        db.add(models.SurveyResponse(
+            user_id=user_id, survey_type="baseline", pillar=pillar,
+            item_id=item_id, score=score, timestamp=now,
+        ))
+    db.add(models.Score(
+        user_id=user_id, date=now, survey_type="baseline",
+        pillar1_score=50, pillar2_score=66.7, pillar3_score=75, total_score=63.2,
+    ))
+    db.commit()
+
+
+def bulk_insert(db, user_id: int) -> None:
+    now = datetime.utcnow()
+    db.execute(insert(models.SurveyResponse), [
+        {"user_id": user_id, "survey_type": "baseline", "pillar": pillar,
+         "item_id": item_id, "score": score, "timestamp": now}
+        for pillar, item_id, score in ITEMS
+    ])
+    db.execute(insert(models.Score).values(
+        user_id=user_id, date=now, survey_type="baseline",
+        pillar1_score=50, pillar2_score=66.7, pillar3_score=75, total_score=63.2,
+    ))
+    db.commit()
+
+
+def run(fn, submissions: int) -> float:
+    db = SessionLocal()
+    try:
+        user = models.User(email=f"bench_{fn.__name__}@pbcm.local", is_guest=True)
+        db.add(user)
+        db.commit()
+        start = time.perf_counter()
+        for _ in range(submissions):
+            fn(db, user.id)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    return submissions * (len(ITEMS) + 1) / elapsed
+
+
+def main() -> None:
+    submissions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    Base.metadata.create_all(bind=engine)
+    print(f"{engine.url} | {submissions} submissions x {len(ITEMS)} items")
+    for fn in (orm_per_row, bulk_insert):
+        print(f"  {fn.__name__:<12} {run(fn, submissions):>10,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
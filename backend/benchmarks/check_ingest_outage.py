@@ -0,0 +1,100 @@
+"""
+Ingest queue under a database outage (INGEST_MODE=queue).
+
+Queues scored submissions plus one that can never be written, then holds the
+SQLite write lock from another connection while the writer flushes many more
+times than INGEST_MAX_ATTEMPTS. Nothing may be dead-lettered or lose its place
+in the read-your-writes overlay during the outage; once the lock is released
+every good submission must be written and only the bad one dead-lettered.
+Exits non-zero otherwise.
+
+    cd backend && python -m benchmarks.check_ingest_outage
+"""
+from datetime import datetime, timedelta
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+_dir = tempfile.mkdtemp()
+os.environ["INGEST_MODE"] = "queue"
+os.environ["INGEST_QUEUE_PATH"] = f"{_dir}/queue.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_dir}/outage.db")
+# Fail fast on the held lock instead of waiting out the default busy timeout
+os.environ.setdefault("SQLITE_BUSY_TIMEOUT_MS", "50")
+
+from sqlalchemy import func, select  # noqa: E402
+
+from auth import AuthUser  # noqa: E402
+from database import Base, SessionLocal, engine  # noqa: E402
+import ingest_queue  # noqa: E402
+import models  # noqa: E402
+
+SUBMISSIONS = 20
+
+
+def counts():
+    with ingest_queue.queue._lock:
+        dead = ingest_queue.queue._conn.execute("SELECT count(*) FROM dead").fetchone()[0]
+    with SessionLocal() as db:
+        scores = db.scalar(select(func.count()).select_from(models.Score))
+    return len(ingest_queue.queue), dead, scores
+
+
+async def flush_times(n: int) -> int:
+    errors = 0
+    for _ in range(n):
+        try:
+            await ingest_queue.flush()
+        except Exception:
+            errors += 1
+    return errors
+
+
+async def main() -> None:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(models.User(email="outage@pbcm.local", is_guest=False))
+        db.commit()
+        user_id = db.scalar(select(models.User.id))
+    user = AuthUser(id=user_id, is_guest=False, age_bracket="30-39", language="ja", gender=None)
+    start = datetime(2025, 1, 6)
+    for i in range(SUBMISSIONS):
+        await ingest_queue.enqueue(user, start + timedelta(days=i), "weekly",
+                                   [{"pillar": "drivers", "item_id": "d1", "score": 3}], {"total_score": 50.0})
+    # NOT NULL item_id: a data error on every attempt
+    await ingest_queue.enqueue(user, start + timedelta(days=SUBMISSIONS), "weekly",
+                               [{"pillar": "drivers", "item_id": None, "score": 3}], {"total_score": 50.0})
+
+    failures = []
+    flushes = 3 * ingest_queue.INGEST_MAX_ATTEMPTS
+    lock = sqlite3.connect(engine.url.database, isolation_level=None)
+    lock.execute("BEGIN EXCLUSIVE")
+    try:
+        errors = await flush_times(flushes)
+        pending, dead, scores = counts()
+        overlay = len(await ingest_queue.pending_scores(user_id))
+        print(f"outage: {flushes} flushes, {errors} failed; pending {pending}, dead {dead}, "
+              f"written {scores}, overlay {overlay}")
+        if dead or pending != SUBMISSIONS + 1 or overlay != SUBMISSIONS + 1:
+            failures.append("submissions left the queue during the outage")
+    finally:
+        lock.execute("ROLLBACK")
+        lock.close()
+
+    await flush_times(flushes)
+    pending, dead, scores = counts()
+    print(f"recovered: pending {pending}, dead {dead}, written {scores}")
+    if scores != SUBMISSIONS:
+        failures.append(f"{scores} of {SUBMISSIONS} submissions written")
+    if dead != 1 or pending:
+        failures.append("the bad submission was not the only one dead-lettered")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Query-plan regression check for the per-user time indexes (migration 0002).
+
+Runs EXPLAIN QUERY PLAN (SQLite) for the statements the history, latest and
+tests reads are built from, on a migrated and ANALYZEd synthetic population,
+and exits non-zero when one stops searching its index or needs a temp B-tree
+to sort.
+
+    cd backend && python -m benchmarks.check_query_plans [--users 300]
+"""
+from datetime import datetime
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/plans.db")
+
+from sqlalchemy import exists, select, text  # noqa: E402
+
+from database import IS_SQLITE, engine  # noqa: E402
+from pagination import encode_cursor, keyset_page  # noqa: E402
+from routers.surveys import SCORE_FIELDS  # noqa: E402
+from routers.tests import RESULT_FIELDS  # noqa: E402
+import models  # noqa: E402
+
+BACKEND = Path(__file__).resolve().parent.parent
+USER_ID = 1
+CURSOR = encode_cursor(datetime(2025, 6, 1), 1000)
+
+
+def _statements():
+    """(name, statement, index it must search) for each checked read."""
+    scores = models.Score.__table__
+    results = models.TestResult.__table__
+    history = select(*(scores.c[f] for f in SCORE_FIELDS)).where(scores.c.user_id == USER_ID)
+    in_range = history.where(scores.c.date >= datetime(2024, 1, 1), scores.c.date < datetime(2025, 1, 1))
+    has_baseline = (
+        exists().where(models.Score.user_id == USER_ID, models.Score.survey_type == "baseline")
+        .label("has_baseline")
+    )
+    tests = select(*(results.c[f] for f in RESULT_FIELDS)).where(results.c.user_id == USER_ID)
+    return [
+        ("history", keyset_page(history, scores.c.date, scores.c.id, None).limit(12),
+         "ix_scores_user_date"),
+        ("history cursor", keyset_page(history, scores.c.date, scores.c.id, CURSOR).limit(12),
+         "ix_scores_user_date"),
+        ("history range", keyset_page(in_range, scores.c.date, scores.c.id, None).limit(12),
+         "ix_scores_user_date"),
+        ("latest", select(models.Score).where(models.Score.user_id == USER_ID)
+         .order_by(models.Score.date.desc()).limit(1), "ix_scores_user_date"),
+        ("has baseline", select(has_baseline), "ix_scores_user_survey_type"),
+        ("tests", keyset_page(tests, results.c.timestamp, results.c.id, None).limit(10),
+         "ix_test_results_user_timestamp"),
+        ("tests cursor", keyset_page(tests, results.c.timestamp, results.c.id, CURSOR).limit(10),
+         "ix_test_results_user_timestamp"),
+    ]
+
+
+def query_plan(conn, stmt) -> list:
+    compiled = stmt.compile(dialect=engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EXPLAIN-based index regression check.")
+    parser.add_argument("--users", type=int, default=300, help="synthetic users to plan against")
+    args = parser.parse_args()
+    if not IS_SQLITE:
+        raise SystemExit("EXPLAIN QUERY PLAN check runs on SQLite only")
+
+    env = dict(os.environ)
+    for cmd in (["migrate"], ["benchmarks.populate", "--users", str(args.users), "--no-stats"]):
+        subprocess.run([sys.executable, "-m", *cmd], cwd=BACKEND, env=env, check=True, capture_output=True)
+
+    failures = []
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        for name, stmt, index in _statements():
+            plan = query_plan(conn, stmt)
+            print(f"{name}:")
+            for step in plan:
+                print(f"  {step}")
+            if not any(index in step for step in plan):
+                failures.append(f"{name}: does not use {index}")
+            if any("TEMP B-TREE" in step for step in plan):
+                failures.append(f"{name}: sorts in a temp B-tree")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
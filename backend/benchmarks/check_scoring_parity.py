@@ -0,0 +1,126 @@
+"""
+Parity check: batch_scoring's vectorized rescoring against scoring.py.
+
+Builds a synthetic history in memory (no database) from a fixed seed: every
+item answered with every half-point of its scale plus values just outside it,
+then whole users with baseline and weekly rows, some weekly rows skipping the
+health/skills pillars so carry-forward is exercised. Each single answer and
+each row must score exactly as the scalar functions do. Exits non-zero
+otherwise.
+
+    cd backend && python -m benchmarks.check_scoring_parity [--users 200]
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from batch_scoring import PILLARS, SCORE_COLUMNS, match_responses, normalize_items, rescore, round1, verify
+from scoring import (
+    LIKERT_RANGE, PHQ_GAD_ITEMS, PHQ_GAD_RANGE, STRESS_ITEM, STRESS_RANGE,
+    calculate_pillar1_score, calculate_pillar2_score, calculate_pillar3_score,
+)
+
+ITEMS = (
+    ("d1", "d2", "d3", "d4", "d5", "d6"),
+    ("h1", "h2", "h3", "h4", "h5", "h6", "h7", "h8"),
+    ("s1", "s2", "s3", "s4", "s5"),
+)
+PILLAR_SCORE = (calculate_pillar1_score, calculate_pillar2_score, lambda r: calculate_pillar3_score(r, {}))
+
+
+def answers(item_id: str) -> np.ndarray:
+    """Every half-point of the item's scale, and one point past each end."""
+    if item_id in PHQ_GAD_ITEMS:
+        lo, hi = PHQ_GAD_RANGE
+    elif item_id == STRESS_ITEM:
+        lo, hi = STRESS_RANGE
+    else:
+        lo, hi = LIKERT_RANGE
+    return np.arange(lo - 1, hi + 1.5, 0.5)
+
+
+def check_items() -> list:
+    failures = []
+    for pillar, items in enumerate(ITEMS):
+        for item_id in items:
+            raw = answers(item_id)
+            vector = round1(normalize_items(
+                np.full(len(raw), pillar, dtype=np.int8), np.array([item_id] * len(raw), dtype=object), raw
+            ))
+            for r, v in zip(raw.tolist(), vector.tolist()):
+                expected = PILLAR_SCORE[pillar]({item_id: r})
+                if expected != v:
+                    failures.append(f"{item_id}={r}: scalar {expected}, vector {v}")
+    return failures
+
+
+def synthetic_history(users: int, weeks: int, seed: int):
+    rng = np.random.default_rng(seed)
+    scores = {"id": [], "user_id": [], "date": [], "weekly": []}
+    responses = {"user_id": [], "timestamp": [], "pillar": [], "item_id": [], "score": []}
+    for user_id in range(1, users + 1):
+        for week in range(weeks):
+            date = f"2025-{1 + week // 4:02d}-{1 + 7 * (week % 4):02d} 09:00:00.000000"
+            weekly = week > 0 and rng.random() < 0.8
+            scores["id"].append(len(scores["id"]) + 1)
+            scores["user_id"].append(user_id)
+            scores["date"].append(date)
+            scores["weekly"].append(weekly)
+            for pillar, items in enumerate(ITEMS):
+                # Weekly check-ins may leave health and skills to carry forward
+                if weekly and pillar and rng.random() < 0.5:
+                    continue
+                for item_id in items:
+                    if rng.random() < 0.15:
+                        continue
+                    responses["user_id"].append(user_id)
+                    responses["timestamp"].append(date)
+                    responses["pillar"].append(pillar)
+                    responses["item_id"].append(item_id)
+                    responses["score"].append(float(rng.choice(answers(item_id))))
+
+    n = len(scores["id"])
+    scores = {
+        "id": np.array(scores["id"], dtype=np.int64),
+        "user_id": np.array(scores["user_id"], dtype=np.int64),
+        "date": np.array(scores["date"], dtype=object),
+        "weekly": np.array(scores["weekly"], dtype=bool),
+        **{c: np.full(n, np.nan) for c in SCORE_COLUMNS},
+    }
+    responses = {
+        "user_id": np.array(responses["user_id"], dtype=np.int64),
+        "timestamp": np.array(responses["timestamp"], dtype=object),
+        "pillar": np.array(responses["pillar"], dtype=np.int8),
+        "item_id": np.array(responses["item_id"], dtype=object),
+        "score": np.array(responses["score"], dtype=np.float64),
+    }
+    return scores, responses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vectorized vs scalar scoring parity on synthetic responses.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failures = check_items()
+    print(f"items: {sum(len(answers(i)) for items in ITEMS for i in items)} answers across "
+          f"{', '.join(PILLARS)}, {len(failures)} mismatches")
+
+    scores, responses = synthetic_history(args.users, args.weeks, args.seed)
+    score_idx = match_responses(scores, responses)
+    result = rescore(scores, responses, score_idx)
+    bad = verify(scores, responses, score_idx, result, len(scores["id"]))
+    print(f"history: {len(scores['id'])} rows, {len(responses['score'])} responses, {bad} mismatches")
+    if bad:
+        failures.append(f"{bad} rescored rows differ from scoring.py")
+
+    for failure in failures[:20]:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
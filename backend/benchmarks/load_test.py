@@ -0,0 +1,322 @@
+"""
+End-to-end load test: concurrent virtual users each run the scripted journey
+
+    guest login -> baseline survey -> cognitive tests (packed trials)
+    -> dashboard -> weekly survey -> PDF report
+
+against the real app, optionally on top of a synthetic population (see
+benchmarks/populate.py), and report p50/p95/p99 latency and throughput per
+step. Results are written as JSON so runs can be compared.
+
+    cd backend && python -m benchmarks.load_test --users 50 --journeys 4
+    cd backend && python -m benchmarks.load_test --scale 1m --target uvicorn --workers 2
+    cd backend && python -m benchmarks.load_test --url http://127.0.0.1:8000   # running server
+    cd backend && python -m benchmarks.load_test --compare benchmarks/results/before.json
+
+--target asgi drives the app in-process (no sockets); --target uvicorn starts the
+production launcher (python -m serve) on a free port with the same environment. DATABASE_URL defaults to
+a fresh SQLite file; migrations always run first.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# step -> route it exercises
+STEPS = {
+    "guest_login": "POST /api/auth/guest",
+    "baseline": "POST /api/surveys/submit-batch",
+    "tests": "POST /api/tests/submit-trials",
+    "dashboard": "GET /api/dashboard",
+    "weekly": "POST /api/surveys/submit-batch",
+    "pdf": "GET /api/reports/pdf",
+}
+# Settings worth recording next to the numbers
+ENV_KNOBS = (
+    "DB_MODE", "DB_POOL_SIZE", "SQLITE_WAL", "SQLITE_SINGLE_WRITER", "INGEST_MODE", "RESPONSE_CACHE",
+    "GUEST_MODE", "PDF_WORKERS", "PASSWORD_HASH_WORKERS", "RATE_LIMIT", "MAX_INFLIGHT",
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--url", help="drive an already running server instead")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--scale", help="populate first: approximate rows (10k, 1m, 10m or a number)")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--journeys", type=int, default=3, help="journeys per virtual user")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between steps")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="result JSON (default: benchmarks/results/<target>-<time>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier result JSON to diff against")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/loadtest.db")
+os.environ.setdefault("PDF_CACHE_DIR", tempfile.mkdtemp())
+# Every virtual user comes from one IP; RATE_LIMIT=1 measures the limiter itself
+os.environ.setdefault("RATE_LIMIT", "0")
+
+import httpx  # noqa: E402
+
+from benchmarks.populate import parse_scale, populate, ROWS_PER_USER  # noqa: E402
+from database import DB_MODE, SessionLocal, engine  # noqa: E402
+import migrate  # noqa: E402
+
+SURVEY_ITEMS = {
+    "drivers": ("d1", "d2", "d3", "d4", "d5", "d6"),
+    "health": ("h1", "h2", "h3", "h4", "h5", "h6", "h7", "h8"),
+    "skills_survey": ("s1", "s2", "s3", "s4", "s5"),
+}
+
+
+def survey(rng: random.Random, survey_type: str) -> dict:
+    body = {"survey_type": survey_type, "drivers": {i: rng.randint(1, 5) for i in SURVEY_ITEMS["drivers"]}}
+    if survey_type != "weekly":
+        body["health"] = {i: rng.randint(0, 3) for i in SURVEY_ITEMS["health"][:6]}
+        body["health"].update(h7=rng.randint(1, 10), h8=rng.randint(1, 5))
+        body["skills_survey"] = {i: rng.randint(1, 5) for i in SURVEY_ITEMS["skills_survey"]}
+    return body
+
+
+def trial_block(rng: random.Random, n: int, mean_rt: float, stroop: bool = False) -> dict:
+    rts, flags = [], []
+    for i in range(n):
+        correct = rng.random() < 0.9
+        rts.append(int(max(120, rng.gauss(mean_rt, mean_rt * 0.2))) if rng.random() > 0.02 else -1)
+        flags.append((1 if correct else 0) | (2 if stroop and i % 2 else 0))
+    return {
+        "rt_ms": base64.b64encode(struct.pack(f"<{n}h", *rts)).decode(),
+        "flags": base64.b64encode(bytes(flags)).decode(),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Counter] = defaultdict(Counter)
+        self.journeys = 0
+
+    async def step(self, client: httpx.AsyncClient, name: str, method: str, url: str,
+                   **kw) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            r = await client.request(method, url, **kw)
+        except Exception as exc:
+            self.errors[name][type(exc).__name__] += 1
+            return None
+        elapsed = time.perf_counter() - start
+        if r.status_code >= 400:
+            self.errors[name][str(r.status_code)] += 1
+            return None
+        self.latencies[name].append(elapsed)
+        return r
+
+
+async def journey(client: httpx.AsyncClient, rec: Recorder, rng: random.Random) -> None:
+    async def pause():
+        if args.think_ms:
+            await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+
+    r = await rec.step(client, "guest_login", "POST", "/api/auth/guest",
+                       json={"language": "ja" if rng.random() < 0.8 else "en"})
+    if r is None:
+        return
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    steps = (
+        ("baseline", "POST", "/api/surveys/submit-batch", {"json": survey(rng, "baseline")}),
+        ("tests", "POST", "/api/tests/submit-trials", {"json": {
+            "attention": trial_block(rng, 40, 380),
+            "flexibility": trial_block(rng, 40, 650, stroop=True),
+            "memory": {"correct_count": rng.randint(3, 10), "total_trials": 10},
+        }}),
+        ("dashboard", "GET", "/api/dashboard", {}),
+        ("weekly", "POST", "/api/surveys/submit-batch", {"json": survey(rng, "weekly")}),
+        ("pdf", "GET", "/api/reports/pdf", {}),
+    )
+    for name, method, url, kw in steps:
+        await pause()
+        if await rec.step(client, name, method, url, headers=headers, **kw) is None:
+            return
+    rec.journeys += 1
+
+
+async def drive(client: httpx.AsyncClient, rec: Recorder) -> float:
+    async def virtual_user(i: int):
+        rng = random.Random(args.seed * 100_003 + i)
+        for _ in range(args.journeys):
+            await journey(client, rec, rng)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(args.users)))
+    return time.perf_counter() - start
+
+
+async def run_asgi(rec: Recorder) -> float:
+    import main
+
+    # httpx's ASGITransport does not send lifespan events; run the app's lifespan around the test
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            return await drive(client, rec)
+
+
+async def run_http(rec: Recorder, base_url: str) -> float:
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        return await drive(client, rec)
+
+
+def start_uvicorn() -> "tuple[subprocess.Popen, str]":
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "serve", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND, env=dict(os.environ),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise TimeoutError("uvicorn did not become healthy within 60s")
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def summarize(rec: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for name, route in STEPS.items():
+        lat = sorted(rec.latencies.get(name, []))
+        entry = {"route": route, "count": len(lat), "errors": dict(rec.errors.get(name, {})),
+                 "rps": round(len(lat) / elapsed, 2) if elapsed else 0.0}
+        if len(lat) >= 2:
+            q = statistics.quantiles(lat, n=100, method="inclusive")
+            entry.update(mean_ms=_ms(statistics.fmean(lat)), p50_ms=_ms(q[49]), p95_ms=_ms(q[94]),
+                         p99_ms=_ms(q[98]), max_ms=_ms(lat[-1]))
+        elif lat:
+            entry.update(mean_ms=_ms(lat[0]), p50_ms=_ms(lat[0]), p95_ms=_ms(lat[0]),
+                         p99_ms=_ms(lat[0]), max_ms=_ms(lat[0]))
+        routes[name] = entry
+    return {
+        "wall_seconds": round(elapsed, 3),
+        "journeys_completed": rec.journeys,
+        "journeys_per_sec": round(rec.journeys / elapsed, 3) if elapsed else 0.0,
+        "routes": routes,
+    }
+
+
+def print_summary(result: dict, previous: Optional[dict]) -> None:
+    meta = result["meta"]
+    print(f"{meta['target']} | {meta['database']} | DB_MODE={meta['db_mode']} | "
+          f"{meta['users']} users x {meta['journeys']} journeys")
+    header = f"  {'step':<12}{'count':>7}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header + ("   p95 vs previous" if previous else ""))
+    for name, r in result["routes"].items():
+        line = (f"  {name:<12}{r['count']:>7}{sum(r['errors'].values()):>5}{r['rps']:>9.1f}"
+                f"{r.get('p50_ms', 0):>10.1f}{r.get('p95_ms', 0):>10.1f}{r.get('p99_ms', 0):>10.1f}")
+        before = (previous or {}).get("routes", {}).get(name, {}).get("p95_ms")
+        if before and r.get("p95_ms"):
+            line += f"   {(r['p95_ms'] - before) / before:+7.1%}"
+        print(line)
+    print(f"  {result['journeys_completed']} journeys in {result['wall_seconds']:.1f}s "
+          f"({result['journeys_per_sec']:.2f}/s)")
+    for name, r in result["routes"].items():
+        if r["errors"]:
+            print(f"  errors in {name}: {r['errors']}")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    if not args.url:
+        migrate.main()
+    population = None
+    if args.scale:
+        db = SessionLocal()
+        try:
+            population = populate(db, max(1, parse_scale(args.scale) // ROWS_PER_USER), seed=args.seed)
+        finally:
+            db.close()
+
+    rec = Recorder()
+    started_at = datetime.utcnow().isoformat(timespec="seconds")
+    proc = None
+    target = "http" if args.url else args.target
+    try:
+        if args.url:
+            elapsed = asyncio.run(run_http(rec, args.url))
+        elif args.target == "uvicorn":
+            proc, base_url = start_uvicorn()
+            elapsed = asyncio.run(run_http(rec, base_url))
+        else:
+            elapsed = asyncio.run(run_asgi(rec))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    result = {
+        "meta": {
+            "started_at": started_at,
+            "target": target if target != "uvicorn" else f"uvicorn x{args.workers}",
+            "database": engine.url.render_as_string(hide_password=True),
+            "db_mode": DB_MODE,
+            "scale": args.scale,
+            "population": population,
+            "users": args.users,
+            "journeys": args.journeys,
+            "think_ms": args.think_ms,
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "env": {k: os.environ[k] for k in ENV_KNOBS if k in os.environ},
+        },
+        **summarize(rec, elapsed),
+    }
+    out = args.out or RESULTS_DIR / f"{target}-{started_at.replace(':', '')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+    print_summary(result, previous)
+    print(f"  saved {out}")
+    if any(r["errors"] for r in result["routes"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
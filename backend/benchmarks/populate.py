@@ -0,0 +1,226 @@
+"""
+Synthetic population for load tests: users with baseline / weekly / monthly
+survey histories, cognitive test results, scores and user_latest_score rows,
+written straight into the models.py schema in chunked executemany inserts.
+
+Each user has a latent level per pillar that answers are drawn around, and
+drivers drift week to week, so scores, percentiles and suggestions look like
+real data rather than constants. Scores are computed with scoring.py the way
+the submit route computes them, so batch_scoring finds nothing to change.
+
+    cd backend && python -m migrate && python -m benchmarks.populate --scale 1m
+    cd backend && python -m benchmarks.populate --users 2000 --seed 7
+
+--scale is the approximate total row count (10k, 1m, 10m, or a number).
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import argparse
+import random
+import time
+
+from sqlalchemy import func, insert, select
+
+from database import SessionLocal
+from population_stats import get_benchmark, population
+from scoring import (
+    age_bracket, calculate_pillar1_score, calculate_pillar2_score, calculate_pillar3_score,
+    normalize_test_score_attention, normalize_test_score_flexibility, normalize_test_score_memory,
+    total_score,
+)
+import models
+
+DRIVER_ITEMS = ("d1", "d2", "d3", "d4", "d5", "d6")
+HEALTH_ITEMS = ("h1", "h2", "h3", "h4", "h5", "h6", "h7", "h8")
+SKILL_ITEMS = ("s1", "s2", "s3", "s4", "s5")
+REVERSE_ITEMS = {"d4", "d5"}
+# Rough rows per user at the default history lengths, to turn --scale into a user count
+ROWS_PER_USER = 160
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def parse_scale(value: str) -> int:
+    return SCALES.get(value.lower()) or int(value.replace("_", ""))
+
+
+def _likert(rng: random.Random, level: float, reverse: bool = False) -> float:
+    """1-5 answer around a latent level in [-2, 2] (positive = better)."""
+    raw = 3 + (-level if reverse else level) + rng.gauss(0, 0.7)
+    return float(min(5, max(1, round(raw))))
+
+
+def _drivers(rng: random.Random, level: float) -> Dict[str, float]:
+    return {i: _likert(rng, level, i in REVERSE_ITEMS) for i in DRIVER_ITEMS}
+
+
+def _health(rng: random.Random, level: float) -> Dict[str, float]:
+    # PHQ/GAD 0-3 and stress 1-10: lower is better
+    answers = {i: float(min(3, max(0, round(1.2 - 0.8 * level + rng.gauss(0, 0.6))))) for i in HEALTH_ITEMS[:6]}
+    answers["h7"] = float(min(10, max(1, round(5 - 2 * level + rng.gauss(0, 1.5)))))
+    answers["h8"] = _likert(rng, level, reverse=True)  # memory complaints
+    return answers
+
+
+def _skills(rng: random.Random, level: float) -> Dict[str, float]:
+    return {i: _likert(rng, level) for i in SKILL_ITEMS}
+
+
+def _tests(rng: random.Random, level: float) -> Dict[str, tuple]:
+    """test type -> (raw_score, normalized_score)."""
+    attention_rt = max(180.0, rng.gauss(380 - 50 * level, 50))
+    attention_acc = min(1.0, max(0.5, rng.gauss(0.9 + 0.03 * level, 0.04)))
+    memory = min(10, max(0, round(rng.gauss(6 + level, 1.5))))
+    flexibility_rt = max(250.0, rng.gauss(650 - 70 * level, 80))
+    flexibility_acc = min(1.0, max(0.5, rng.gauss(0.88 + 0.04 * level, 0.05)))
+    return {
+        "attention": (round(attention_rt, 1), normalize_test_score_attention(attention_rt, attention_acc)),
+        "memory": (float(memory), normalize_test_score_memory(memory, 10)),
+        "flexibility": (
+            round(flexibility_rt, 1), normalize_test_score_flexibility(flexibility_rt, flexibility_acc)
+        ),
+    }
+
+
+class Batch:
+    """Rows for a chunk of users, keyed by table."""
+
+    def __init__(self):
+        self.users: List[dict] = []
+        self.responses: List[dict] = []
+        self.tests: List[dict] = []
+        self.scores: List[dict] = []
+        self.latest: List[dict] = []
+
+
+def generate_user(rng: random.Random, batch: Batch, user_id: int, score_id: int, now: datetime,
+                  max_weeks: int) -> int:
+    """Append one user's history to `batch`; returns the next free score id."""
+    age = rng.randint(20, 65)
+    gender = rng.choice(("male", "female", "female", "male", "other"))
+    weeks = rng.randint(0, max_weeks)
+    start = now - timedelta(days=7 * weeks + rng.uniform(0, 6))
+    batch.users.append({
+        "id": user_id,
+        "email": f"loadtest_{user_id}@pbcm.local",
+        "hashed_password": None,
+        "is_guest": rng.random() < 0.2,
+        "age": age,
+        "gender": gender,
+        "language": "ja" if rng.random() < 0.8 else "en",
+        "consent_given": True,
+        "created_at": start,
+    })
+    levels = {p: max(-2.0, min(2.0, rng.gauss(0, 0.8))) for p in ("drivers", "health", "skills")}
+    last: Optional[dict] = None
+    has_baseline = False
+
+    for week in range(weeks + 1):
+        date = start + timedelta(days=7 * week, hours=rng.uniform(-12, 12))
+        survey_type = "baseline" if week == 0 else "monthly" if week % 4 == 0 else "weekly"
+        levels["drivers"] = max(-2.0, min(2.0, levels["drivers"] + rng.gauss(0.02, 0.15)))
+        drivers = _drivers(rng, levels["drivers"])
+        health = skills = None
+        p2 = last["pillar2_score"] if last else None
+        p3 = last["pillar3_score"] if last else None
+        if survey_type != "weekly":
+            health = _health(rng, levels["health"])
+            skills = _skills(rng, levels["skills"])
+            tests = _tests(rng, levels["skills"])
+            batch.tests.extend(
+                {"user_id": user_id, "timestamp": date, "test_type": test_type,
+                 "raw_score": raw, "normalized_score": norm}
+                for test_type, (raw, norm) in tests.items()
+            )
+            p2 = calculate_pillar2_score(health)
+            # As the submit route scores it: test results live only in test_results
+            p3 = calculate_pillar3_score(skills, {})
+        for pillar, answers in (("drivers", drivers), ("health", health), ("skills", skills)):
+            batch.responses.extend(
+                {"user_id": user_id, "timestamp": date, "survey_type": survey_type,
+                 "pillar": pillar, "item_id": item_id, "score": score}
+                for item_id, score in (answers or {}).items()
+            )
+        p1 = calculate_pillar1_score(drivers)
+        last = {
+            "id": score_id, "user_id": user_id, "date": date, "survey_type": survey_type,
+            "pillar1_score": p1, "pillar2_score": p2, "pillar3_score": p3,
+            "total_score": total_score(p1, p2, p3) if p2 is not None and p3 is not None else None,
+        }
+        batch.scores.append(last)
+        has_baseline = has_baseline or survey_type == "baseline"
+        score_id += 1
+
+    bracket = age_bracket(age)
+    batch.latest.append({
+        "user_id": user_id,
+        "score_id": last["id"],
+        **{k: last[k] for k in ("date", "survey_type", "pillar1_score", "pillar2_score",
+                                "pillar3_score", "total_score")},
+        "has_baseline": has_baseline,
+        "benchmark_bracket": bracket,
+        "benchmark": get_benchmark(bracket, gender, last["survey_type"]),
+    })
+    return score_id
+
+
+def populate(db, n_users: int, seed: int = 0, max_weeks: int = 24, chunk_users: int = 1000,
+             rebuild_stats: bool = True, verbose: bool = True) -> Dict[str, int]:
+    """Append `n_users` synthetic users after the existing ones; returns rows written per table."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    user_id = (db.scalar(select(func.max(models.User.id))) or 0) + 1
+    score_id = (db.scalar(select(func.max(models.Score.id))) or 0) + 1
+    counts = dict.fromkeys(("users", "survey_responses", "test_results", "scores", "user_latest_score"), 0)
+    start = time.perf_counter()
+
+    for first in range(0, n_users, chunk_users):
+        batch = Batch()
+        for _ in range(min(chunk_users, n_users - first)):
+            score_id = generate_user(rng, batch, user_id, score_id, now, max_weeks)
+            user_id += 1
+        for model, rows, name in (
+            (models.User, batch.users, "users"),
+            (models.SurveyResponse, batch.responses, "survey_responses"),
+            (models.TestResult, batch.tests, "test_results"),
+            (models.Score, batch.scores, "scores"),
+            (models.UserLatestScore, batch.latest, "user_latest_score"),
+        ):
+            if rows:
+                db.execute(insert(model), rows)
+                counts[name] += len(rows)
+        db.commit()
+        if verbose:
+            total = sum(counts.values())
+            print(f"  {first + len(batch.users):>10,} users  {total:>12,} rows  "
+                  f"{total / (time.perf_counter() - start):>9,.0f} rows/s", flush=True)
+
+    if rebuild_stats:
+        population.rebuild(db)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic user population.")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--scale", type=parse_scale, help="approximate total rows: 10k, 1m, 10m or a number")
+    size.add_argument("--users", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-weeks", type=int, default=24, help="longest history per user")
+    parser.add_argument("--chunk-users", type=int, default=1000, help="users per insert transaction")
+    parser.add_argument("--no-stats", action="store_true", help="skip rebuilding population_stats")
+    args = parser.parse_args()
+    n_users = args.users or max(1, args.scale // ROWS_PER_USER)
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        counts = populate(db, n_users, args.seed, args.max_weeks, args.chunk_users, not args.no_stats)
+    finally:
+        db.close()
+    print(f"wrote {sum(counts.values()):,} rows in {time.perf_counter() - start:,.1f}s")
+    for name, count in counts.items():
+        print(f"  {name:<18} {count:>12,}")
+
+
+if __name__ == "__main__":
+    main()
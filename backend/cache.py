@@ -0,0 +1,193 @@
+"""
+Small in-process caches shared by the routers, and the per-user response cache.
+
+The response cache holds the serialized JSON of read endpoints whose data only
+changes when that user writes (latest score, history pages, suggestions,
+dashboard). Entries live in one bucket per user, so the write endpoints drop
+everything for a user with a single invalidate(user_id). Backends:
+
+- memory (default): per-process LRU of user buckets. Invalidation only reaches
+  the worker that took the write, so with more than one worker
+  (WEB_CONCURRENCY, set by the serve launcher) it is turned off
+- redis: one hash per user on REDIS_URL (any Redis 7+ protocol server), shared
+  by every worker; needs the optional `redis` package
+- off
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional, Sequence
+import logging
+import os
+import time
+
+from fastapi import Response
+import orjson
+
+import metrics
+import serialization
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "memory")  # "memory" | "redis" | "off"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_USERS = int(os.getenv("RESPONSE_CACHE_USERS", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or "1")
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MemoryBackend:
+    """User buckets in a TTLCache: a bucket (and every entry in it) expires `ttl` after creation."""
+
+    def __init__(self, max_users: int, ttl: float):
+        self._users = TTLCache(maxsize=max_users, ttl=ttl)
+
+    async def get(self, user_id: int, field: str) -> Optional[bytes]:
+        bucket = self._users.get(user_id)
+        return None if bucket is None else bucket.get(field)
+
+    async def set(self, user_id: int, field: str, value: bytes) -> None:
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = {}
+            self._users.set(user_id, bucket)
+        bucket[field] = value
+
+    async def invalidate(self, user_id: int) -> None:
+        self._users.invalidate(user_id)
+
+
+class RedisBackend:
+    """One hash per user; the hash expires `ttl` after its first field is written."""
+
+    def __init__(self, url: str, ttl: float):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.ttl = int(ttl)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"pbcm:resp:{user_id}"
+
+    async def get(self, user_id: int, field: str) -> Optional[bytes]:
+        return await self._redis.hget(self._key(user_id), field)
+
+    async def set(self, user_id: int, field: str, value: bytes) -> None:
+        key = self._key(user_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, field, value)
+            pipe.expire(key, self.ttl, nx=True)
+            await pipe.execute()
+
+    async def invalidate(self, user_id: int) -> None:
+        await self._redis.delete(self._key(user_id))
+
+
+class ResponseCache:
+    """Per-user, per-endpoint cache of JSON responses (body plus a few headers).
+
+    Backend errors are logged and treated as misses, so a cache outage only
+    costs the database queries it would have saved.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _field(endpoint: str, params: Sequence) -> str:
+        return ":".join([endpoint, *map(str, params)])
+
+    async def get(self, user_id: int, endpoint: str, params: Sequence = ()) -> Optional[Response]:
+        if self.backend is None:
+            return None
+        try:
+            value = await self.backend.get(user_id, self._field(endpoint, params))
+        except Exception:
+            logger.exception("response cache get failed")
+            value = None
+        metrics.response_cache_requests.inc((endpoint, "miss" if value is None else "hit"))
+        if value is None:
+            return None
+        # Stored as "<headers JSON>\n<body>"; JSON encoders never emit a raw newline
+        headers, body = value.split(b"\n", 1)
+        return Response(content=body, media_type="application/json", headers=orjson.loads(headers))
+
+    async def put(self, user_id: int, endpoint: str, content: Any, params: Sequence = (),
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+        """Serialize `content` (or pre-serialized JSON bytes), cache it and return it as a Response."""
+        body = content if isinstance(content, bytes) else serialization.dumps(content)
+        headers = dict(headers or {})
+        if self.backend is not None:
+            try:
+                await self.backend.set(
+                    user_id, self._field(endpoint, params), orjson.dumps(headers) + b"\n" + body
+                )
+            except Exception:
+                logger.exception("response cache set failed")
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def invalidate(self, user_id: int) -> None:
+        """Drop every cached response for the user. Call after committing their write."""
+        if self.backend is None:
+            return
+        try:
+            await self.backend.invalidate(user_id)
+        except Exception:
+            logger.exception("response cache invalidate failed")
+
+
+def _backend():
+    if RESPONSE_CACHE == "memory":
+        if WEB_CONCURRENCY > 1:
+            # Users would read stale data from workers that missed their write
+            logger.warning("RESPONSE_CACHE=memory is off with %d workers; use RESPONSE_CACHE=redis",
+                           WEB_CONCURRENCY)
+            return None
+        return MemoryBackend(RESPONSE_CACHE_USERS, RESPONSE_CACHE_TTL)
+    if RESPONSE_CACHE == "redis":
+        return RedisBackend(REDIS_URL, RESPONSE_CACHE_TTL)
+    return None
+
+
+response_cache = ResponseCache(_backend())
@@ -0,0 +1,114 @@
+"""
+Fixed-size score series for charting long histories (GET /api/surveys/history
+with `points` and/or `bucket`).
+
+- LTTB (Largest-Triangle-Three-Buckets) keeps `points` of the user's scores,
+  chosen on total_score so peaks and dips survive; each is a full score row.
+- Buckets (week, month, or `auto` = `points` equal time slices) return
+  min/mean/max per pillar and total over the scores in each bucket.
+
+Imported lazily by the router, so NumPy is not loaded at startup.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+METRICS = ("pillar1_score", "pillar2_score", "pillar3_score", "total_score")
+
+
+def _values(rows: Sequence, metric: str) -> np.ndarray:
+    return np.array([getattr(r, metric) for r in rows], dtype=np.float64)  # None -> nan
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the `points` samples LTTB keeps (always the first and last)."""
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    # Bucket i (1..points-2) covers [edges[i], edges[i+1]); first and last points are fixed
+    edges = 1 + np.arange(points - 1) * (n - 2) // (points - 2)
+    keep = np.empty(points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    prev = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < points - 2:
+            nxt_x, nxt_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            nxt_x, nxt_y = x[-1], y[-1]
+        area = np.abs(
+            (x[prev] - nxt_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (nxt_y - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
+
+
+def lttb(rows: Sequence, points: int) -> List:
+    """`points` rows (ordered by date) picked by LTTB on total_score, pillar1 where total is missing."""
+    if len(rows) <= points:
+        return list(rows)
+    x = np.array([r.date.timestamp() for r in rows])
+    y = _values(rows, "total_score")
+    y = np.where(np.isnan(y), _values(rows, "pillar1_score"), y)
+    y = np.nan_to_num(y)
+    return [rows[i] for i in lttb_indices(x, y, points)]
+
+
+def _bucket_keys(dates: np.ndarray, bucket: str, start: datetime, end: datetime, points: int) -> np.ndarray:
+    if bucket == "week":
+        days = dates.astype("datetime64[D]").astype(np.int64)
+        # Epoch day 0 is a Thursday; shift so weeks start on Monday
+        return (days + 3) // 7
+    if bucket == "month":
+        return dates.astype("datetime64[M]").astype(np.int64)
+    span = max((end - start).total_seconds(), 1.0)
+    offset = (dates - np.datetime64(start, "us")).astype("timedelta64[us]").astype(np.float64) / 1e6
+    return np.minimum((offset / (span / points)).astype(np.int64), points - 1)
+
+
+def _bucket_start(key: int, bucket: str, start: datetime, end: datetime, points: int) -> datetime:
+    if bucket == "week":
+        day = np.datetime64(key * 7 - 3, "D")
+    elif bucket == "month":
+        day = np.datetime64(key, "M").astype("datetime64[D]")
+    else:
+        return start + (end - start) * key / points
+    return datetime.fromisoformat(str(day))
+
+
+def buckets(rows: Sequence, bucket: str, start: datetime, end: datetime, points: int = 0) -> List[Dict]:
+    """Per-bucket count and min/mean/max of each metric; rows must be ordered by date."""
+    if not rows:
+        return []
+    dates = np.array([r.date for r in rows], dtype="datetime64[us]")
+    keys = _bucket_keys(dates, bucket, start, end, points)
+    firsts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[firsts, len(rows)])
+
+    stats = {}
+    for metric in METRICS:
+        v = _values(rows, metric)
+        present = ~np.isnan(v)
+        n = np.add.reduceat(present.astype(np.int64), firsts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg = np.add.reduceat(np.where(present, v, 0.0), firsts) / n
+        # fmin/fmax skip NaN unless the whole bucket is NaN
+        stats[metric] = (np.fmin.reduceat(v, firsts), avg, np.fmax.reduceat(v, firsts))
+
+    def value(x) -> Optional[float]:
+        return None if np.isnan(x) else round(float(x), 1)
+
+    series = []
+    for b, first in enumerate(firsts):
+        key = int(keys[first])
+        series.append({
+            "start": _bucket_start(key, bucket, start, end, points).isoformat(),
+            "n": int(counts[b]),
+            **{
+                metric: {"min": value(lo[b]), "mean": value(avg[b]), "max": value(hi[b])}
+                for metric, (lo, avg, hi) in stats.items()
+            },
+        })
+    return series
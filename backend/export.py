@@ -0,0 +1,146 @@
+"""
+Bulk data export: CSV or Parquet, one file per table.
+
+Rows are always read in chunks (yield_per / server-side cursor) and written
+chunk by chunk, so memory stays flat however large survey_responses grows.
+Per-user exports are served by routers/exports.py; the research cohort export
+(every consenting user, no emails or password hashes) is an admin CLI:
+
+    cd backend && python -m export --out ./export [--format parquet] [--chunk-size 50000]
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+import argparse
+import csv
+import io
+import os
+import time
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, select
+
+from database import SessionLocal
+import models
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "50000"))
+FORMATS = ("csv", "parquet")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+DATASETS = {
+    "survey_responses": models.SurveyResponse.__table__,
+    "test_results": models.TestResult.__table__,
+    "scores": models.Score.__table__,
+}
+# Cohort only: who the rows belong to, minus anything identifying
+USER_COLUMNS = ("id", "is_guest", "age", "gender", "language", "created_at")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_chunk(rows: Iterable, header: Optional[Iterable[str]] = None) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows([_csv_value(v) for v in row] for row in rows)
+    return buf.getvalue()
+
+
+def arrow_schema(columns):
+    import pyarrow as pa
+
+    def arrow_type(column):
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        return pa.string()
+
+    return pa.schema([pa.field(c.name, arrow_type(c)) for c in columns])
+
+
+def arrow_batch(rows, schema):
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema
+    )
+
+
+def write_rows(db, stmt, columns, fmt: str, path: Path, chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    """Stream `stmt` into a file at `path` chunk by chunk; returns the row count."""
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    count = 0
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write(csv_chunk((), [c.name for c in columns]))
+            for rows in result.partitions(chunk_size):
+                f.write(csv_chunk(rows))
+                count += len(rows)
+        return count
+
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(columns)
+    # One row group per chunk; the writer only ever holds the current batch
+    with pq.ParquetWriter(str(path), schema, compression="zstd") as writer:
+        for rows in result.partitions(chunk_size):
+            writer.write_batch(arrow_batch(rows, schema))
+            count += len(rows)
+    return count
+
+
+def user_statement(dataset: str, user_id: int):
+    table = DATASETS[dataset]
+    return select(table).where(table.c.user_id == user_id).order_by(table.c.id)
+
+
+def cohort_statements():
+    """(name, columns, statement) for every table, restricted to consenting users."""
+    users = models.User.__table__
+    consenting = select(users.c.id).where(users.c.consent_given.is_(True))
+    user_columns = [users.c[name] for name in USER_COLUMNS]
+    yield "users", user_columns, select(*user_columns).where(users.c.id.in_(consenting)).order_by(users.c.id)
+    for name, table in DATASETS.items():
+        yield name, list(table.columns), (
+            select(table).where(table.c.user_id.in_(consenting)).order_by(table.c.id)
+        )
+
+
+def export_cohort(out_dir: Path, fmt: str, chunk_size: int = EXPORT_CHUNK_SIZE) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    db = SessionLocal()
+    try:
+        for name, columns, stmt in cohort_statements():
+            start = time.perf_counter()
+            path = out_dir / f"{name}.{fmt}"
+            tmp = path.with_suffix(f".{fmt}.tmp")
+            count = write_rows(db, stmt, columns, fmt, tmp, chunk_size)
+            os.replace(tmp, path)
+            print(f"  {name:<17} {count:>12,} rows  {time.perf_counter() - start:6.1f}s  {path}")
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Research cohort export (consenting users only).")
+    parser.add_argument("--out", type=Path, required=True, help="output directory")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    export_cohort(args.out, args.format, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
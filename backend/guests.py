@@ -0,0 +1,186 @@
+"""
+Guest account lifecycle.
+
+Every "try as guest" click used to leave a users row behind forever. Two
+things keep that in check:
+
+- Expiry: a guest whose account is older than GUEST_TTL_DAYS and who has not
+  saved anything in that time is deleted, with their survey responses, test
+  results, trials and scores. A background reaper (every GUEST_REAP_SECONDS)
+  does it in chunks of GUEST_REAP_CHUNK users, one short write transaction per
+  chunk. Keep the TTL above the token lifetime (7 days), so only guests who can
+  no longer sign in are removed. By hand:
+
+      cd backend && python -m guests --reap [--dry-run]
+
+- GUEST_MODE=memory: guest login writes nothing. The guest gets a negative id
+  from a block reserved in guest_id_blocks, and the users row is inserted on
+  their first write (ensure_persisted), so visitors who only look around leave
+  no trace in users or its email index.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+import argparse
+import asyncio
+import logging
+import os
+
+from sqlalchemy import delete, exists, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from auth import AuthUser, invalidate_user
+from cache import response_cache
+from database import engine, open_session, single_writer
+import models
+
+logger = logging.getLogger(__name__)
+
+GUEST_MODE = os.getenv("GUEST_MODE", "db")  # "db" | "memory"
+GUEST_TTL_DAYS = float(os.getenv("GUEST_TTL_DAYS", "30"))
+GUEST_REAP_SECONDS = float(os.getenv("GUEST_REAP_SECONDS", "3600"))  # 0 = no background reaper
+GUEST_REAP_CHUNK = int(os.getenv("GUEST_REAP_CHUNK", "500"))
+# Pause between chunks so request writes are not queued behind a long purge
+GUEST_REAP_PAUSE = float(os.getenv("GUEST_REAP_PAUSE", "0.1"))
+GUEST_ID_BLOCK = int(os.getenv("GUEST_ID_BLOCK", "1000"))
+
+_dialect_insert = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}.get(engine.dialect.name)
+
+# Child tables first; user_latest_score before scores (it references score_id)
+_CASCADE = (
+    models.TestTrials.__table__,
+    models.TestResult.__table__,
+    models.SurveyResponse.__table__,
+    models.UserLatestScore.__table__,
+    models.Score.__table__,
+)
+
+_free_ids: List[int] = []
+_id_lock = asyncio.Lock()
+
+
+def guest_email(user_id: int) -> str:
+    # "m" is not a hex digit, so these never collide with guest_<uuid hex> emails
+    return f"guest_m{-user_id}@pbcm.local"
+
+
+def new_guest(user_id: int, language: str) -> models.User:
+    return models.User(
+        id=user_id,
+        email=guest_email(user_id),
+        hashed_password=None,
+        is_guest=True,
+        language=language,
+        consent_given=True,
+        created_at=datetime.utcnow(),
+    )
+
+
+async def allocate_id() -> int:
+    """Next in-memory guest id; reserves GUEST_ID_BLOCK ids per DB round trip."""
+    async with _id_lock:
+        if not _free_ids:
+            table = models.GuestIdBlock.__table__
+            async with single_writer(), open_session() as db:
+                low = await db.scalar(
+                    update(table).where(table.c.id == 1)
+                    .values(next_id=table.c.next_id - GUEST_ID_BLOCK)
+                    .returning(table.c.next_id)
+                )
+                await db.commit()
+            # Block [low, low + GUEST_ID_BLOCK - 1], handed out from the top (-1 first) downwards
+            _free_ids.extend(range(low, low + GUEST_ID_BLOCK))
+        return _free_ids.pop()
+
+
+async def ensure_persisted(db, user: AuthUser) -> None:
+    """Insert an in-memory guest's users row before their first write. The caller commits."""
+    if user.id >= 0 or not user.is_guest:
+        return
+    row = new_guest(user.id, user.language)
+    values = {
+        c.name: getattr(row, c.name) for c in models.User.__table__.columns
+        if getattr(row, c.name) is not None
+    }
+    if _dialect_insert is not None:
+        await db.execute(_dialect_insert(models.User).values(**values).on_conflict_do_nothing())
+    elif await db.get(models.User, user.id) is None:
+        await db.execute(insert(models.User).values(**values))
+
+
+def expired_statement(cutoff: datetime, limit: Optional[int] = None):
+    """Ids of guests created before `cutoff` with nothing saved since."""
+    users = models.User.__table__
+
+    def active(table, ts_col):
+        return exists().where(table.c.user_id == users.c.id, ts_col >= cutoff)
+
+    scores, tests, responses = (models.Score.__table__, models.TestResult.__table__,
+                                models.SurveyResponse.__table__)
+    return (
+        select(users.c.id)
+        .where(
+            users.c.is_guest.is_(True),
+            users.c.created_at < cutoff,
+            ~active(scores, scores.c.date),
+            ~active(tests, tests.c.timestamp),
+            ~active(responses, responses.c.timestamp),
+        )
+        .order_by(users.c.id)
+        .limit(limit)
+    )
+
+
+async def reap(cutoff: Optional[datetime] = None, chunk_size: int = GUEST_REAP_CHUNK,
+               dry_run: bool = False) -> int:
+    """Delete expired guests and their rows, one transaction per chunk; returns how many."""
+    cutoff = cutoff or datetime.utcnow() - timedelta(days=GUEST_TTL_DAYS)
+    if dry_run:
+        async with open_session() as db:
+            return await db.scalar(select(func.count()).select_from(expired_statement(cutoff).subquery()))
+
+    reaped = 0
+    while True:
+        async with single_writer(), open_session() as db:
+            ids = (await db.scalars(expired_statement(cutoff, chunk_size))).all()
+            if not ids:
+                return reaped
+            for table in _CASCADE:
+                await db.execute(delete(table).where(table.c.user_id.in_(ids)))
+            await db.execute(delete(models.User).where(models.User.id.in_(ids)))
+            await db.commit()
+        for user_id in ids:
+            invalidate_user(user_id)
+            await response_cache.invalidate(user_id)
+        reaped += len(ids)
+        await asyncio.sleep(GUEST_REAP_PAUSE)
+
+
+async def run_reaper() -> None:
+    """Background task: reap expired guests every GUEST_REAP_SECONDS."""
+    while True:
+        await asyncio.sleep(GUEST_REAP_SECONDS)
+        try:
+            reaped = await reap()
+            if reaped:
+                logger.info("reaped %d expired guest accounts", reaped)
+        except Exception:
+            logger.exception("guest reaper failed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Guest account maintenance.")
+    parser.add_argument("--reap", action="store_true", help="delete expired guests and their data")
+    parser.add_argument("--dry-run", action="store_true", help="only count expired guests")
+    parser.add_argument("--ttl-days", type=float, default=GUEST_TTL_DAYS)
+    parser.add_argument("--chunk-size", type=int, default=GUEST_REAP_CHUNK)
+    args = parser.parse_args()
+    if not args.reap:
+        parser.print_help()
+        return
+    cutoff = datetime.utcnow() - timedelta(days=args.ttl_days)
+    count = asyncio.run(reap(cutoff, args.chunk_size, args.dry_run))
+    print(f"{'would reap' if args.dry_run else 'reaped'} {count:,} guests inactive since {cutoff:%Y-%m-%d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Write-behind ingestion for survey submissions (INGEST_MODE=queue).
+
+submit-batch validates and scores in memory, appends the submission to a
+durable local SQLite queue (one small fsync'd insert) and answers. A background
+writer in each worker claims queued submissions in batches and group-commits
+them to the main database: one executemany for all survey_responses, then
+save_score per submission, then a single commit.
+
+Until a submission is written, get_latest_score and the dashboard overlay it
+from the queue, so the submitting user reads their own write. The queue file
+is shared by every worker on the host; claims are leased, so a crashed worker's
+batch is picked up again, and a replayed submission that already reached the
+database is skipped. When a batch fails, its submissions are retried one per
+transaction, and one that has failed on its own INGEST_MAX_ATTEMPTS times with
+a data error moves to the `dead` table of the queue file instead of blocking
+the queue. Connection and lock errors (the database being down) count against
+no item: the batch is released and the writer backs off exponentially.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from sqlalchemy import exists, insert, select
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from starlette.concurrency import run_in_threadpool
+
+from auth import AuthUser
+from cache import response_cache
+from database import open_session, single_writer
+from guests import ensure_persisted
+import models
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODE = os.getenv("INGEST_MODE", "direct")  # "direct" | "queue"
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "./ingest_queue.db")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+# How long the writer waits after the first new submission, to gather a batch
+INGEST_FLUSH_DELAY = float(os.getenv("INGEST_FLUSH_DELAY", "0.05"))
+INGEST_LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "60"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+# Writer backoff after a failed flush: doubles from the first value up to the second
+INGEST_RETRY_SECONDS = float(os.getenv("INGEST_RETRY_SECONDS", "1"))
+INGEST_RETRY_MAX_SECONDS = float(os.getenv("INGEST_RETRY_MAX_SECONDS", "60"))
+# FULL: an acknowledged submission survives power loss, not just a crash
+INGEST_QUEUE_SYNC = os.getenv("INGEST_QUEUE_SYNC", "FULL")
+
+SCORE_FIELDS = ("pillar1_score", "pillar2_score", "pillar3_score", "total_score")
+
+
+@dataclass
+class PendingScore:
+    """A queued submission's score, shaped like models.Score for readers."""
+    user_id: int
+    date: datetime
+    survey_type: str
+    pillar1_score: Optional[float]
+    pillar2_score: Optional[float]
+    pillar3_score: Optional[float]
+    total_score: Optional[float]
+    id: Optional[int] = None  # assigned when the writer commits it
+
+
+class DurableQueue:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={INGEST_QUEUE_SYNC}")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"  # claims, so a replayed lease is checked
+            " failures INTEGER NOT NULL DEFAULT 0,"  # data errors writing this item on its own
+            " claimed_at REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pending)")}
+        if "failures" not in columns:  # queue files from before the column
+            self._conn.execute("ALTER TABLE pending ADD COLUMN failures INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_pending_user ON pending (user_id, seq)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead ("
+            " seq INTEGER PRIMARY KEY,"
+            " user_id INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL,"
+            " error TEXT,"
+            " failed_at REAL NOT NULL)"
+        )
+        self._lock = Lock()
+
+    def append(self, user_id: int, payload: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT INTO pending (user_id, payload) VALUES (?, ?)", (user_id, payload))
+
+    def claim(self, limit: int) -> List[Tuple[int, int, str]]:
+        """Lease up to `limit` unclaimed (or lease-expired) entries, oldest first."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "UPDATE pending SET claimed_at = ?, attempts = attempts + 1 WHERE seq IN ("
+                " SELECT seq FROM pending WHERE claimed_at IS NULL OR claimed_at < ?"
+                " ORDER BY seq LIMIT ?) RETURNING seq, attempts, payload",
+                (now, now - INGEST_LEASE_SECONDS, limit),
+            ).fetchall()
+        return sorted(rows)
+
+    def release(self, seqs: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany("UPDATE pending SET claimed_at = NULL WHERE seq = ?", [(s,) for s in seqs])
+
+    def fail(self, seq: int) -> int:
+        """Count a data error for the entry and release it; returns its failure count."""
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE pending SET failures = failures + 1, claimed_at = NULL WHERE seq = ? RETURNING failures",
+                (seq,),
+            ).fetchone()
+        return row[0] if row else 0
+
+    def delete(self, seqs: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM pending WHERE seq = ?", [(s,) for s in seqs])
+
+    def dead_letter(self, seq: int, error: str) -> None:
+        """Move an entry that keeps failing out of the queue, keeping it for inspection."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dead (seq, user_id, payload, attempts, error, failed_at)"
+                    " SELECT seq, user_id, payload, failures, ?, ? FROM pending WHERE seq = ?",
+                    (error, time.time(), seq),
+                )
+                self._conn.execute("DELETE FROM pending WHERE seq = ?", (seq,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def for_user(self, user_id: int) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM pending WHERE user_id = ? ORDER BY seq DESC", (user_id,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM pending").fetchone()[0]
+
+
+queue: Optional[DurableQueue] = DurableQueue(INGEST_QUEUE_PATH) if INGEST_MODE == "queue" else None
+_wake = asyncio.Event()
+
+
+def enabled() -> bool:
+    return queue is not None
+
+
+async def enqueue(user: AuthUser, date: datetime, survey_type: str,
+                  responses: List[Dict], scores: Dict[str, Optional[float]]) -> None:
+    """Durably queue one scored submission; returns once it is on disk."""
+    payload = json.dumps({
+        "user": {
+            "id": user.id, "is_guest": user.is_guest, "age_bracket": user.age_bracket,
+            "language": user.language, "gender": user.gender,
+        },
+        "date": date.isoformat(),
+        "survey_type": survey_type,
+        "responses": [[r["pillar"], r["item_id"], r["score"]] for r in responses],
+        "scores": scores,
+    })
+    await run_in_threadpool(queue.append, user.id, payload)
+    _wake.set()
+
+
+def _pending_score(item: Dict) -> PendingScore:
+    return PendingScore(
+        user_id=item["user"]["id"],
+        date=datetime.fromisoformat(item["date"]),
+        survey_type=item["survey_type"],
+        **{k: item["scores"].get(k) for k in SCORE_FIELDS},
+    )
+
+
+async def pending_scores(user_id: int) -> List[PendingScore]:
+    """This user's submissions not yet written to the database, newest first."""
+    if queue is None:
+        return []
+    payloads = await run_in_threadpool(queue.for_user, user_id)
+    return [_pending_score(json.loads(p)) for p in payloads]
+
+
+async def _already_written(db, item: Dict) -> bool:
+    return bool(await db.scalar(select(exists().where(
+        models.Score.user_id == item["user"]["id"],
+        models.Score.date == datetime.fromisoformat(item["date"]),
+        models.Score.survey_type == item["survey_type"],
+    ))))
+
+
+async def _write(claimed: List[Tuple[int, int, str]]) -> None:
+    """Write claimed entries in one transaction and drop them from the queue."""
+    # score_store overlays this queue on reads, so import it here rather than at the top
+    from score_store import observe_score, save_score
+
+    async with single_writer(), open_session() as db:
+        items = []
+        for _, attempts, payload in claimed:
+            item = json.loads(payload)
+            # A retried lease may have committed before its worker died
+            if attempts > 1 and await _already_written(db, item):
+                continue
+            items.append(item)
+        for user in {AuthUser(**item["user"]) for item in items}:
+            await ensure_persisted(db, user)
+        rows = [
+            {
+                "user_id": item["user"]["id"],
+                "survey_type": item["survey_type"],
+                "pillar": pillar,
+                "item_id": item_id,
+                "score": score,
+                "timestamp": datetime.fromisoformat(item["date"]),
+            }
+            for item in items
+            for pillar, item_id, score in item["responses"]
+        ]
+        if rows:
+            await db.execute(insert(models.SurveyResponse), rows)
+        for item in items:
+            await save_score(
+                db,
+                user=AuthUser(**item["user"]),
+                date=datetime.fromisoformat(item["date"]),
+                survey_type=item["survey_type"],
+                **{k: item["scores"].get(k) for k in SCORE_FIELDS},
+            )
+        await db.commit()
+    for item in items:
+        observe_score(AuthUser(**item["user"]), item["survey_type"],
+                      **{k: item["scores"].get(k) for k in SCORE_FIELDS})
+    # Cached reads taken before the commit carry the overlay (no score ids yet)
+    for user_id in {item["user"]["id"] for item in items}:
+        await response_cache.invalidate(user_id)
+    await run_in_threadpool(queue.delete, [seq for seq, _, _ in claimed])
+
+
+def _unavailable(error: Exception) -> bool:
+    """The database could not be reached or was locked: says nothing about the submissions."""
+    if isinstance(error, (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+async def _failed(seq: int, error: Exception) -> None:
+    """An item failed on its own with a data error: count it, dead-letter it at the limit."""
+    failures = await run_in_threadpool(queue.fail, seq)
+    if failures >= INGEST_MAX_ATTEMPTS:
+        logger.error("ingest item %d failed %d times, moved to the dead table: %r", seq, failures, error)
+        await run_in_threadpool(queue.dead_letter, seq, repr(error))
+
+
+async def flush(limit: int = INGEST_BATCH_SIZE) -> int:
+    """Write one batch of queued submissions in a single transaction; returns how many were claimed."""
+    claimed = await run_in_threadpool(queue.claim, limit)
+    if not claimed:
+        return 0
+    leased = {seq for seq, _, _ in claimed}
+    try:
+        try:
+            await _write(claimed)
+            leased.clear()
+        except Exception as e:
+            if _unavailable(e):
+                raise
+            if len(claimed) == 1:
+                await _failed(claimed[0][0], e)
+                leased.clear()
+                raise
+            # One transaction per submission (still leased), so a bad one cannot hold back the rest
+            logger.exception("ingest batch of %d failed; retrying one at a time", len(claimed))
+            for entry in claimed:
+                seq = entry[0]
+                try:
+                    await _write([entry])
+                except Exception as e:
+                    if _unavailable(e):
+                        raise
+                    logger.exception("ingest item %d failed", seq)
+                    await _failed(seq, e)
+                leased.discard(seq)
+    except BaseException:
+        if leased:
+            await run_in_threadpool(queue.release, list(leased))
+        raise
+    return len(claimed)
+
+
+async def run_writer() -> None:
+    """Background task: drain the queue, waking on new submissions (or every second)."""
+    failed_flushes = 0
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(_wake.wait(), timeout=1.0)
+                await asyncio.sleep(INGEST_FLUSH_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            _wake.clear()
+            try:
+                while await flush() == INGEST_BATCH_SIZE:
+                    pass
+                failed_flushes = 0
+            except Exception:
+                logger.exception("ingest queue flush failed")
+                failed_flushes += 1
+                await asyncio.sleep(min(INGEST_RETRY_MAX_SECONDS, INGEST_RETRY_SECONDS * 2 ** min(failed_flushes - 1, 16)))
+    finally:
+        # Leave nothing this worker acknowledged behind on a clean shutdown
+        try:
+            while await flush():
+                pass
+        except Exception:
+            logger.exception("ingest queue final flush failed")
@@ -1,30 +1,90 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
+import importlib
+import logging
+import os
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from database import Base, engine
-from routers import auth, surveys, tests, suggestions, reports
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+import admission
+import database
+import guests
+import ingest_queue
+import metrics
+import passwords
+import population_stats
+from routers import auth, surveys, tests, suggestions, reports, dashboard, exports
+
+# The schema is managed by `python -m migrate` (alembic), not created on import
+
+logger = logging.getLogger(__name__)
+
+# 0 skips the background warm-up (e.g. one-off scripts importing the app)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
+
+async def warm_up():
+    """Pay first-request costs (DB connect, bcrypt, reportlab, NumPy) after /health is already up."""
+    results = await asyncio.gather(
+        database.warm_up(), passwords.warm_up(), reports.warm_up(),
+        run_in_threadpool(importlib.import_module, "trial_scoring"),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("startup warm-up step failed: %r", result)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background = [asyncio.create_task(population_stats.run_snapshots())]
+    if STARTUP_WARMUP:
+        background.append(asyncio.create_task(warm_up()))
+    if guests.GUEST_REAP_SECONDS > 0:
+        background.append(asyncio.create_task(guests.run_reaper()))
+    if ingest_queue.enabled():
+        background.append(asyncio.create_task(ingest_queue.run_writer()))
+    yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    passwords.shutdown_pool()
+    reports.shutdown_pool()
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Personal Brain Capital Monitor API",
     description="PBCM - 個人の脳の健康・スキルを自己報告で計測するAPI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson for every endpoint that returns plain data (see serialization.py)
+    default_response_class=ORJSONResponse,
 )
 
+# Innermost, so 429 / 503 responses still get CORS headers and are counted in metrics
+app.add_middleware(admission.AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor", "Retry-After"],
 )
+# Outermost, so latency covers CORS and every router
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(database.engine)
+if database.async_engine is not None:
+    metrics.instrument_engine(database.async_engine)
 
 app.include_router(auth.router)
 app.include_router(surveys.router)
 app.include_router(tests.router)
 app.include_router(suggestions.router)
 app.include_router(reports.router)
+app.include_router(dashboard.router)
+app.include_router(exports.router)
 
 
 @app.get("/")
@@ -35,3 +95,8 @@ def root():
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,22 @@
+"""
+Create or upgrade the schema. The API no longer runs create_all on import, so
+run this once per deploy (and on a fresh database) before starting uvicorn.
+
+    cd backend && python -m migrate
+"""
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+HERE = Path(__file__).resolve().parent
+
+
+def main() -> None:
+    config = Config(str(HERE / "alembic.ini"))
+    config.set_main_option("script_location", str(HERE / "migrations"))
+    command.upgrade(config, "head")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""initial schema
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_initial"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have these tables
+    if "users" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=True),
+        sa.Column("is_guest", sa.Boolean(), nullable=True),
+        sa.Column("age", sa.Integer(), nullable=True),
+        sa.Column("gender", sa.String(), nullable=True),
+        sa.Column("language", sa.String(), nullable=True),
+        sa.Column("consent_given", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "survey_responses",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("survey_type", sa.String(), nullable=False),
+        sa.Column("pillar", sa.String(), nullable=False),
+        sa.Column("item_id", sa.String(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_survey_responses_id", "survey_responses", ["id"])
+
+    op.create_table(
+        "test_results",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("test_type", sa.String(), nullable=False),
+        sa.Column("raw_score", sa.Float(), nullable=False),
+        sa.Column("normalized_score", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_test_results_id", "test_results", ["id"])
+
+    op.create_table(
+        "scores",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("date", sa.DateTime(), nullable=True),
+        sa.Column("survey_type", sa.String(), nullable=False),
+        sa.Column("pillar1_score", sa.Float(), nullable=True),
+        sa.Column("pillar2_score", sa.Float(), nullable=True),
+        sa.Column("pillar3_score", sa.Float(), nullable=True),
+        sa.Column("total_score", sa.Float(), nullable=True),
+    )
+    op.create_index("ix_scores_id", "scores", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("scores")
+    op.drop_table("test_results")
+    op.drop_table("survey_responses")
+    op.drop_table("users")
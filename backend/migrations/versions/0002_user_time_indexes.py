@@ -0,0 +1,39 @@
+"""composite indexes for per-user, time-ordered reads
+
+Revision ID: 0002_user_time_indexes
+Revises: 0001_initial
+Create Date: 2026-10-17 00:00:01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_user_time_indexes"
+down_revision: Union[str, None] = "0001_initial"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_scores_user_date", "scores", ["user_id", "date"], if_not_exists=True)
+    op.create_index(
+        "ix_scores_user_survey_type", "scores", ["user_id", "survey_type"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_test_results_user_timestamp", "test_results", ["user_id", "timestamp"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_survey_responses_user_timestamp", "survey_responses", ["user_id", "timestamp"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_survey_responses_user_timestamp", table_name="survey_responses")
+    op.drop_index("ix_test_results_user_timestamp", table_name="test_results")
+    op.drop_index("ix_scores_user_survey_type", table_name="scores")
+    op.drop_index("ix_scores_user_date", table_name="scores")
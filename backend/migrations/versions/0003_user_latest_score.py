@@ -0,0 +1,65 @@
+"""user_latest_score table, backfilled from scores
+
+Revision ID: 0003_user_latest_score
+Revises: 0002_user_time_indexes
+Create Date: 2026-10-17 00:00:02
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_user_latest_score"
+down_revision: Union[str, None] = "0002_user_time_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "user_latest_score" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "user_latest_score",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("score_id", sa.Integer(), sa.ForeignKey("scores.id"), nullable=False),
+            sa.Column("date", sa.DateTime(), nullable=False),
+            sa.Column("survey_type", sa.String(), nullable=False),
+            sa.Column("pillar1_score", sa.Float(), nullable=True),
+            sa.Column("pillar2_score", sa.Float(), nullable=True),
+            sa.Column("pillar3_score", sa.Float(), nullable=True),
+            sa.Column("total_score", sa.Float(), nullable=True),
+            sa.Column("has_baseline", sa.Boolean(), nullable=False),
+            sa.Column("benchmark_bracket", sa.String(), nullable=True),
+            sa.Column("benchmark", sa.JSON(), nullable=True),
+        )
+
+    # benchmark is left NULL and filled in from the user's bracket on read
+    op.execute("""
+        INSERT INTO user_latest_score (
+            user_id, score_id, date, survey_type,
+            pillar1_score, pillar2_score, pillar3_score, total_score, has_baseline
+        )
+        SELECT s.user_id, s.id, s.date, s.survey_type,
+               s.pillar1_score, s.pillar2_score, s.pillar3_score, s.total_score,
+               EXISTS (
+                   SELECT 1 FROM scores b
+                   WHERE b.user_id = s.user_id AND b.survey_type = 'baseline'
+               )
+        FROM scores s
+        WHERE s.date IS NOT NULL
+          AND s.id = (
+              SELECT s2.id FROM scores s2
+              WHERE s2.user_id = s.user_id
+              ORDER BY s2.date DESC, s2.id DESC
+              LIMIT 1
+          )
+          AND NOT EXISTS (
+              SELECT 1 FROM user_latest_score l WHERE l.user_id = s.user_id
+          )
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("user_latest_score")
@@ -0,0 +1,36 @@
+"""population_stats table for incremental peer benchmarks
+
+Revision ID: 0004_population_stats
+Revises: 0003_user_latest_score
+Create Date: 2026-10-17 00:00:03
+
+Backfill with: python -m population_stats --rebuild
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_population_stats"
+down_revision: Union[str, None] = "0003_user_latest_score"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "population_stats" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "population_stats",
+        sa.Column("age_bracket", sa.String(), primary_key=True),
+        sa.Column("gender", sa.String(), primary_key=True),
+        sa.Column("survey_type", sa.String(), primary_key=True),
+        sa.Column("state", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("population_stats")
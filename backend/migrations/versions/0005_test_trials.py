@@ -0,0 +1,37 @@
+"""test_trials table: packed per-trial reaction times behind test_results
+
+Revision ID: 0005_test_trials
+Revises: 0004_population_stats
+Create Date: 2026-10-17 00:00:04
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_test_trials"
+down_revision: Union[str, None] = "0004_population_stats"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "test_trials" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "test_trials",
+        sa.Column("test_result_id", sa.Integer(), sa.ForeignKey("test_results.id"), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("n_trials", sa.Integer(), nullable=False),
+        sa.Column("rt_ms", sa.LargeBinary(), nullable=False),
+        sa.Column("flags", sa.LargeBinary(), nullable=False),
+        sa.Column("stats", sa.JSON(), nullable=True),
+    )
+    op.create_index("ix_test_trials_user_id", "test_trials", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_test_trials_user_id", table_name="test_trials")
+    op.drop_table("test_trials")
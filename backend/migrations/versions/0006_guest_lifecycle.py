@@ -0,0 +1,36 @@
+"""guest lifecycle: reaper index on users, id blocks for in-memory guests
+
+Revision ID: 0006_guest_lifecycle
+Revises: 0005_test_trials
+Create Date: 2026-10-17 00:00:05
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_guest_lifecycle"
+down_revision: Union[str, None] = "0005_test_trials"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_users_guest_created", "users", ["is_guest", "created_at"], if_not_exists=True
+    )
+    if "guest_id_blocks" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    table = op.create_table(
+        "guest_id_blocks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("next_id", sa.Integer(), nullable=False),
+    )
+    op.bulk_insert(table, [{"id": 1, "next_id": 0}])
+
+
+def downgrade() -> None:
+    op.drop_table("guest_id_blocks")
+    op.drop_index("ix_users_guest_created", table_name="users")
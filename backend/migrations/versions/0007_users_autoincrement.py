@@ -0,0 +1,33 @@
+"""users.id AUTOINCREMENT on SQLite, so registered users never get id 0
+
+Revision ID: 0007_users_autoincrement
+Revises: 0006_guest_lifecycle
+Create Date: 2026-10-17 00:00:06
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_users_autoincrement"
+down_revision: Union[str, None] = "0006_guest_lifecycle"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Without AUTOINCREMENT SQLite assigns max(id) + 1, which is 0 (or negative)
+    # when only in-memory guests (negative ids) are in the table. PostgreSQL's
+    # sequence is not moved by explicit ids, so it needs nothing.
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table("users", recreate="always", table_kwargs={"sqlite_autoincrement": True}):
+        pass
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table("users", recreate="always", table_kwargs={"sqlite_autoincrement": False}):
+        pass
@@ -0,0 +1,32 @@
+"""population_stats_flushes: snapshot counter, so shared tables know which flushes they include
+
+Revision ID: 0008_population_stats_flushes
+Revises: 0007_users_autoincrement
+Create Date: 2026-10-17 00:00:07
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_population_stats_flushes"
+down_revision: Union[str, None] = "0007_users_autoincrement"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "population_stats_flushes" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    table = op.create_table(
+        "population_stats_flushes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("seq", sa.Integer(), nullable=False),
+    )
+    op.bulk_insert(table, [{"id": 1, "seq": 0}])
+
+
+def downgrade() -> None:
+    op.drop_table("population_stats_flushes")
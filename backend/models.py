@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index, JSON, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -6,6 +6,12 @@ from datetime import datetime
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # guest reaper: WHERE is_guest AND created_at < cutoff
+        Index("ix_users_guest_created", "is_guest", "created_at"),
+        # In-memory guests take negative ids; never hand out 0 after them (migration 0007)
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -24,6 +30,9 @@ class User(Base):
 
 class SurveyResponse(Base):
     __tablename__ = "survey_responses"
+    __table_args__ = (
+        Index("ix_survey_responses_user_timestamp", "user_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -38,6 +47,9 @@ class SurveyResponse(Base):
 
 class TestResult(Base):
     __tablename__ = "test_results"
+    __table_args__ = (
+        Index("ix_test_results_user_timestamp", "user_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -51,6 +63,12 @@ class TestResult(Base):
 
 class Score(Base):
     __tablename__ = "scores"
+    __table_args__ = (
+        # latest / history / suggestions: WHERE user_id = ? ORDER BY date DESC
+        Index("ix_scores_user_date", "user_id", "date"),
+        # has-baseline: WHERE user_id = ? AND survey_type = ?
+        Index("ix_scores_user_survey_type", "user_id", "survey_type"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -62,3 +80,59 @@ class Score(Base):
     total_score = Column(Float, nullable=True)
 
     user = relationship("User", back_populates="scores")
+
+
+class UserLatestScore(Base):
+    """Newest Score per user, upserted in the same transaction as each Score insert."""
+    __tablename__ = "user_latest_score"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    score_id = Column(Integer, ForeignKey("scores.id"), nullable=False)
+    date = Column(DateTime, nullable=False)
+    survey_type = Column(String, nullable=False)
+    pillar1_score = Column(Float, nullable=True)
+    pillar2_score = Column(Float, nullable=True)
+    pillar3_score = Column(Float, nullable=True)
+    total_score = Column(Float, nullable=True)
+    has_baseline = Column(Boolean, nullable=False, default=False)
+    benchmark_bracket = Column(String, nullable=True)
+    benchmark = Column(JSON, nullable=True)
+
+
+class PopulationStat(Base):
+    """Streaming score aggregates per age bracket x gender x survey type (see population_stats)."""
+    __tablename__ = "population_stats"
+
+    age_bracket = Column(String, primary_key=True)
+    gender = Column(String, primary_key=True)  # "*" = all genders
+    survey_type = Column(String, primary_key=True)
+    state = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PopulationStatsFlush(Base):
+    """Single-row counter bumped by every population_stats snapshot, in the same transaction."""
+    __tablename__ = "population_stats_flushes"
+
+    id = Column(Integer, primary_key=True)  # always 1
+    seq = Column(Integer, nullable=False, default=0)
+
+
+class TestTrials(Base):
+    """Per-trial data behind one TestResult, as packed arrays (see trial_scoring)."""
+    __tablename__ = "test_trials"
+
+    test_result_id = Column(Integer, ForeignKey("test_results.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    n_trials = Column(Integer, nullable=False)
+    rt_ms = Column(LargeBinary, nullable=False)  # little-endian int16 per trial, -1 = no response
+    flags = Column(LargeBinary, nullable=False)  # uint8 per trial: 1 = correct, 2 = congruent (Stroop)
+    stats = Column(JSON, nullable=True)  # median/IQR/trimmed mean/interference at last scoring
+
+
+class GuestIdBlock(Base):
+    """Single-row counter handing out blocks of negative ids to GUEST_MODE=memory guests."""
+    __tablename__ = "guest_id_blocks"
+
+    id = Column(Integer, primary_key=True)  # always 1
+    next_id = Column(Integer, nullable=False, default=0)
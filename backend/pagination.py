@@ -0,0 +1,63 @@
+"""
+Keyset (cursor) pagination and NDJSON streaming for per-user history tables.
+
+Pages run newest first on (timestamp, id). The cursor is the last row of the
+previous page, so page N is an index range scan just like page 1. NDJSON mode
+streams every matching row from a server-side cursor in fixed-size chunks.
+"""
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+import base64
+import os
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
+import orjson
+
+from database import open_session
+import serialization
+
+NDJSON_CHUNK_SIZE = int(os.getenv("NDJSON_CHUNK_SIZE", "500"))
+# Largest `limit` for one JSON page; NDJSON without a limit streams everything
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="カーソルが不正です")
+
+
+def keyset_page(stmt, ts_col, id_col, cursor: Optional[str]):
+    """Order newest first and, given a cursor, keep only rows strictly older than it."""
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        # The leading `<=` gives the index a range bound; the OR breaks ties on id
+        stmt = stmt.where(ts_col <= ts, or_(ts_col < ts, and_(ts_col == ts, id_col < row_id)))
+    return stmt.order_by(ts_col.desc(), id_col.desc())
+
+
+def set_next_cursor(response: Response, rows, limit: int, ts_attr: str) -> None:
+    """A full page may have more rows behind it; point the client at them."""
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, ts_attr), last.id)
+
+
+def ndjson_response(stmt, to_dict: Callable) -> StreamingResponse:
+    """Stream `stmt` as NDJSON. Opens its own session, since the body outlives the request's."""
+    async def lines():
+        async with open_session() as db:
+            result = await db.stream(stmt.execution_options(yield_per=NDJSON_CHUNK_SIZE))
+            async for rows in result.partitions(NDJSON_CHUNK_SIZE):
+                yield b"".join(serialization.dumps(to_dict(row), orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
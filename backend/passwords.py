@@ -0,0 +1,81 @@
+"""
+Password hashing off the request path.
+
+bcrypt is deliberately slow CPU work, so hashes are computed in a small process
+pool (outside the API process's GIL) behind their own concurrency pool; when
+PASSWORD_HASH_QUEUE logins are already waiting, the next one gets 503. The
+work factor comes from BCRYPT_ROUNDS; hashes made with a different cost are
+transparently upgraded on the next successful login.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+import asyncio
+import os
+
+from admission import Pool
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 0 runs hashing in the default threadpool instead (hosts that forbid fork)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_CONCURRENCY = int(
+    os.getenv("PASSWORD_HASH_CONCURRENCY", str(max(1, PASSWORD_HASH_WORKERS) * 2))
+)
+
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+
+_executor: Optional[Executor] = None
+_pool = Pool("bcrypt", PASSWORD_HASH_CONCURRENCY, PASSWORD_HASH_QUEUE, retry_after=2)
+
+
+@lru_cache(maxsize=1)
+def pwd_context():
+    # passlib and its bcrypt backend load on first use, not at API import
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def _hash(password: str) -> str:
+    return pwd_context().hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context().verify_and_update(password, hashed)
+
+
+def _load_backend() -> None:
+    pwd_context().handler("bcrypt").get_backend()
+
+
+def _get_executor() -> Optional[Executor]:
+    global _executor
+    if _executor is None and PASSWORD_HASH_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+    return _executor
+
+
+async def _run(fn, *args):
+    async with _pool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Check a password; also return a replacement hash if the stored cost is outdated."""
+    return await _run(_verify_and_update, password, hashed)
+
+
+async def warm_up() -> None:
+    """Start the hashing pool and load bcrypt in it before the first login needs them."""
+    await _run(_load_backend)
+
+
+def shutdown_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,398 @@
+"""
+Population benchmarks computed from real scores.
+
+Every saved Score updates streaming aggregates for its age bracket x gender x
+survey type (plus an all-genders group): count, mean and variance (Welford)
+and a fixed-bin histogram for percentiles. Scores live on a bounded 0-100
+scale, so a 0.5-point histogram gives exact-to-the-bin percentiles, and unlike
+P² or t-digest sketches it merges exactly across workers.
+
+Each process keeps the totals it last loaded plus its own delta; a periodic
+snapshot merges the delta into the population_stats table and reloads. Under
+the multi-worker launcher the totals come from shared_tables instead: one
+publisher reads the table for every worker, and a worker counts its own
+flushed deltas until a generation that includes them is published. Each
+snapshot takes the next population_stats_flushes.seq in its transaction, and
+the publisher reads that counter in the same statement as the totals, so a
+generation says exactly which flushes it includes.
+Reads are dict lookups; derived means/percentiles are recomputed lazily when
+a group changes. Groups with fewer than BENCHMARK_MIN_SAMPLES scores fall back
+to the static scoring.BENCHMARKS.
+
+    cd backend && python -m population_stats --rebuild
+"""
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import logging
+import math
+import os
+
+from sqlalchemy import delete, select, text, true, tuple_, update
+from starlette.concurrency import run_in_threadpool
+
+from database import IS_SQLITE, SessionLocal, single_writer
+from scoring import age_bracket, get_bracket_benchmark
+import models
+import shared_tables
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("drivers", "health", "skills", "total")
+BIN_WIDTH = 0.5
+BINS = int(100 / BIN_WIDTH) + 1
+QUANTILES = (0.25, 0.5, 0.75, 0.9)
+ALL_GENDERS = "*"
+
+BENCHMARK_MIN_SAMPLES = int(os.getenv("BENCHMARK_MIN_SAMPLES", "30"))
+BENCHMARK_SNAPSHOT_SECONDS = float(os.getenv("BENCHMARK_SNAPSHOT_SECONDS", "300"))
+
+GroupKey = Tuple[str, str, str]  # (age bracket, gender, survey type)
+
+
+def normalize_gender(gender: Optional[str]) -> str:
+    gender = (gender or "").strip().lower()
+    return gender or ALL_GENDERS
+
+
+class MetricStats:
+    __slots__ = ("n", "mean", "m2", "hist")
+
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0, hist=None):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.hist = list(hist) if hist is not None else [0] * BINS
+
+    def add(self, x: float) -> None:
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+        self.hist[min(BINS - 1, max(0, int(round(x / BIN_WIDTH))))] += 1
+
+    def merge(self, other: "MetricStats") -> None:
+        """Chan et al. parallel combination of two Welford states."""
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        d = other.mean - self.mean
+        self.mean += d * other.n / n
+        self.m2 += other.m2 + d * d * self.n * other.n / n
+        self.n = n
+        self.hist = [a + b for a, b in zip(self.hist, other.hist)]
+
+    def percentile(self, q: float) -> Optional[float]:
+        if self.n == 0:
+            return None
+        rank = q * (self.n - 1)
+        seen = 0
+        for i, count in enumerate(self.hist):
+            if count and seen + count > rank:
+                return i * BIN_WIDTH
+            seen += count
+        return 100.0
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        sd = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+        out = {"n": self.n, "mean": round(self.mean, 1), "sd": round(sd, 1)}
+        for q in QUANTILES:
+            out[f"p{int(q * 100)}"] = self.percentile(q)
+        return out
+
+    def to_dict(self) -> Dict:
+        # Histograms are mostly empty; store them sparse
+        return {
+            "n": self.n, "mean": self.mean, "m2": self.m2,
+            "hist": {str(i): c for i, c in enumerate(self.hist) if c},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MetricStats":
+        hist = [0] * BINS
+        for i, c in data.get("hist", {}).items():
+            hist[int(i)] = c
+        return cls(data.get("n", 0), data.get("mean", 0.0), data.get("m2", 0.0), hist)
+
+
+def _new_group() -> Dict[str, MetricStats]:
+    return {m: MetricStats() for m in METRICS}
+
+
+def read_totals(db) -> Tuple[Dict[GroupKey, Dict[str, MetricStats]], int]:
+    """Every group's totals and the seq of the last snapshot they include."""
+    flushes = models.PopulationStatsFlush
+    # One statement, so both come from one consistent read on any database
+    rows = db.execute(
+        select(flushes.seq, models.PopulationStat)
+        .select_from(flushes)
+        .outerjoin(models.PopulationStat, true())
+        .where(flushes.id == 1)
+    ).all()
+    # No counter row: no snapshot has been taken, so the table is empty too
+    seq = rows[0][0] if rows else 0
+    totals = {
+        (r.age_bracket, r.gender, r.survey_type):
+            {m: MetricStats.from_dict(r.state.get(m, {})) for m in METRICS}
+        for _, r in rows if r is not None
+    }
+    return totals, seq
+
+
+class SharedTotals:
+    """The totals of one shared_tables generation, with the dict methods PopulationStats uses."""
+
+    def __init__(self, tables: "shared_tables.Tables"):
+        self.tables = tables
+
+    def get(self, key: GroupKey) -> Optional[Dict[str, MetricStats]]:
+        group = self.tables.population_group(key)
+        if group is None:
+            return None
+        return {
+            metric: MetricStats(n, mean, m2, [int(c) for c in hist])
+            for metric, (n, mean, m2, hist) in group.items()
+        }
+
+    def items(self):
+        return ((key, self.get(key)) for key in self.tables.population_keys())
+
+
+class PopulationStats:
+    def __init__(self):
+        self._totals = {}  # or SharedTotals under the multi-worker launcher
+        self._delta: Dict[GroupKey, Dict[str, MetricStats]] = {}
+        # (snapshot seq, delta) already in the table but not yet in the shared totals
+        self._flushed: List[Tuple[int, Dict[GroupKey, Dict[str, MetricStats]]]] = []
+        self._generation: Optional[int] = None
+        self._views: Dict[GroupKey, Dict] = {}
+        self._lock = Lock()
+
+    def observe(self, bracket: str, gender: Optional[str], survey_type: str,
+                values: Dict[str, Optional[float]]) -> None:
+        keys = {(bracket, normalize_gender(gender), survey_type), (bracket, ALL_GENDERS, survey_type)}
+        with self._lock:
+            for key in keys:
+                group = self._delta.setdefault(key, _new_group())
+                for metric, value in values.items():
+                    if value is not None:
+                        group[metric].add(value)
+                self._views.pop(key, None)
+
+    def _view(self, key: GroupKey) -> Optional[Dict]:
+        view = self._views.get(key)
+        if view is not None:
+            return view
+        with self._lock:
+            combined = _new_group()
+            sources = [self._totals.get(key), self._delta.get(key)]
+            sources += [delta.get(key) for _, delta in self._flushed]
+            for source in sources:
+                for metric, stats in (source or {}).items():
+                    combined[metric].merge(stats)
+            view = {metric: stats.summary() for metric, stats in combined.items()}
+            self._views[key] = view
+        return view
+
+    def _use_shared(self, tables: "shared_tables.Tables") -> None:
+        with self._lock:
+            self._totals = SharedTotals(tables)
+            self._generation = tables.generation
+            self._flushed = [(seq, delta) for seq, delta in self._flushed if seq > tables.population_seq]
+            self._views.clear()
+
+    def percentiles(self, bracket: str, gender: Optional[str], survey_type: str) -> Optional[Dict]:
+        """Most specific group with enough samples: own gender, then all genders."""
+        tables = shared_tables.current()
+        if tables is not None and tables.generation != self._generation:
+            self._use_shared(tables)
+        for g in (normalize_gender(gender), ALL_GENDERS):
+            view = self._view((bracket, g, survey_type))
+            if view["total"]["n"] >= BENCHMARK_MIN_SAMPLES:
+                return view
+        return None
+
+    def load(self, db) -> None:
+        tables = shared_tables.current()
+        if tables is not None:
+            self._use_shared(tables)
+            return
+        totals, _ = read_totals(db)
+        with self._lock:
+            self._totals = totals
+            self._flushed = []
+            self._views.clear()
+
+    @staticmethod
+    def _lock_rows(db, keys) -> Dict[GroupKey, models.PopulationStat]:
+        """Load the rows for `keys`, locked until commit so concurrent snapshots cannot overwrite each other."""
+        if IS_SQLITE:
+            # No row locks: take the database write lock before reading instead
+            db.execute(text("BEGIN IMMEDIATE"))
+        table = models.PopulationStat
+        rows = db.scalars(
+            select(table)
+            .where(tuple_(table.age_bracket, table.gender, table.survey_type).in_(sorted(keys)))
+            .order_by(table.age_bracket, table.gender, table.survey_type)
+            .with_for_update()
+        ).all()
+        return {(r.age_bracket, r.gender, r.survey_type): r for r in rows}
+
+    @staticmethod
+    def _next_seq(db) -> int:
+        table = models.PopulationStatsFlush.__table__
+        seq = db.scalar(
+            update(table).where(table.c.id == 1).values(seq=table.c.seq + 1).returning(table.c.seq)
+        )
+        if seq is None:
+            # Schema from create_all rather than the migration
+            db.add(models.PopulationStatsFlush(id=1, seq=1))
+            seq = 1
+        return seq
+
+    def snapshot(self, db) -> int:
+        """Merge this process's delta into population_stats, then reload the totals."""
+        with self._lock:
+            delta, self._delta = self._delta, {}
+        if not delta:
+            self.load(db)
+            return 0
+        try:
+            rows = self._lock_rows(db, delta)
+            seq = self._next_seq(db)
+            for (bracket, gender, survey_type), group in delta.items():
+                row = rows.get((bracket, gender, survey_type))
+                if row is None:
+                    row = models.PopulationStat(
+                        age_bracket=bracket, gender=gender, survey_type=survey_type, state={}
+                    )
+                    db.add(row)
+                state = {}
+                for metric in METRICS:
+                    stats = MetricStats.from_dict(row.state.get(metric, {}))
+                    stats.merge(group[metric])
+                    state[metric] = stats.to_dict()
+                row.state = state
+                row.updated_at = datetime.utcnow()
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the delta back so the next snapshot retries it
+            with self._lock:
+                for key, group in delta.items():
+                    current = self._delta.setdefault(key, _new_group())
+                    for metric in METRICS:
+                        current[metric].merge(group[metric])
+            raise
+        if self._generation is not None:
+            # Still counted locally until the publisher's next read includes it
+            with self._lock:
+                self._flushed.append((seq, delta))
+                for key in delta:
+                    self._views.pop(key, None)
+        self.load(db)
+        return len(delta)
+
+    def rebuild(self, db, chunk_size: int = 50_000) -> int:
+        """Recompute every group from the scores table (initial backfill / repair)."""
+        fresh = PopulationStats()
+        stmt = (
+            select(
+                models.User.age, models.User.gender, models.Score.survey_type,
+                models.Score.pillar1_score, models.Score.pillar2_score,
+                models.Score.pillar3_score, models.Score.total_score,
+            )
+            .join(models.User, models.User.id == models.Score.user_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        count = 0
+        for age, gender, survey_type, p1, p2, p3, total in db.execute(stmt):
+            fresh.observe(age_bracket(age), gender, survey_type, dict(zip(METRICS, (p1, p2, p3, total))))
+            count += 1
+        db.execute(delete(models.PopulationStat))
+        db.commit()
+        fresh.snapshot(db)
+        self.load(db)
+        return count
+
+
+population = PopulationStats()
+
+
+def get_benchmark(bracket: str, gender: Optional[str] = None,
+                  survey_type: str = "baseline") -> Dict[str, float]:
+    """Peer means for the dashboard, falling back to the static table."""
+    view = population.percentiles(bracket, gender, survey_type)
+    if view is None:
+        return get_bracket_benchmark(bracket)
+    return {metric: view[metric]["mean"] for metric in METRICS}
+
+
+def get_percentiles(bracket: str, gender: Optional[str] = None,
+                    survey_type: str = "baseline") -> Optional[Dict]:
+    return population.percentiles(bracket, gender, survey_type)
+
+
+def _snapshot_once() -> None:
+    db = SessionLocal()
+    try:
+        population.snapshot(db)
+    finally:
+        db.close()
+
+
+def _load_once() -> None:
+    db = SessionLocal()
+    try:
+        population.load(db)
+    finally:
+        db.close()
+
+
+async def load_snapshot() -> None:
+    await run_in_threadpool(_load_once)
+
+
+async def snapshot() -> None:
+    async with single_writer():
+        await run_in_threadpool(_snapshot_once)
+
+
+async def run_snapshots() -> None:
+    """Background task: load the totals, then flush the local delta every BENCHMARK_SNAPSHOT_SECONDS."""
+    try:
+        await load_snapshot()
+    except Exception:
+        logger.exception("population stats load failed")
+    try:
+        while True:
+            await asyncio.sleep(BENCHMARK_SNAPSHOT_SECONDS)
+            try:
+                await snapshot()
+            except Exception:
+                logger.exception("population stats snapshot failed")
+    finally:
+        await snapshot()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Population benchmark maintenance.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all groups from scores")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            print(f"rebuilt population stats from {population.rebuild(db):,} scores")
+        else:
+            population.load(db)
+        for key, _ in sorted(population._totals.items()):
+            view = population._view(key)
+            print(key, {m: (view[m]["n"], view[m]["mean"], view[m]["p50"]) for m in METRICS})
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, ConfigDict, EmailStr
 from typing import Optional
 import uuid
 
-from database import get_db
+from cache import response_cache
+from database import get_async_db, single_writer
+import guests
 import models
-from auth import (
-    verify_password, get_password_hash, create_access_token, get_current_user
-)
+from auth import AuthUser, create_user_token, get_current_user_record
+from passwords import hash_password, verify_password
+from serialization import model_response
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -28,6 +31,9 @@ class GuestRequest(BaseModel):
 
 
 class UserResponse(BaseModel):
+    # Built straight from a models.User: UserResponse.model_validate(user)
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     email: str
     is_guest: bool
@@ -43,124 +49,105 @@ class TokenResponse(BaseModel):
     user: UserResponse
 
 
+def token_response(user: models.User) -> Response:
+    return model_response(TokenResponse(
+        access_token=create_user_token(user),
+        token_type="bearer",
+        user=UserResponse.model_validate(user),
+    ))
+
+
 @router.post("/register", response_model=TokenResponse)
-def register(req: RegisterRequest, db: Session = Depends(get_db)):
+async def register(req: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
     if not req.consent_given:
         raise HTTPException(status_code=400, detail="同意が必要です / Consent required")
 
-    existing = db.query(models.User).filter(models.User.email == req.email).first()
+    existing = await db.scalar(select(models.User).where(models.User.email == req.email))
     if existing:
         raise HTTPException(status_code=400, detail="このメールは既に登録されています")
 
     user = models.User(
         email=req.email,
-        hashed_password=get_password_hash(req.password),
+        hashed_password=await hash_password(req.password),
         is_guest=False,
         age=req.age,
         gender=req.gender,
         language=req.language,
         consent_given=req.consent_given,
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    async with single_writer():
+        db.add(user)
+        await db.commit()
 
-    token = create_access_token({"sub": user.id})
-    return TokenResponse(
-        access_token=token,
-        token_type="bearer",
-        user=UserResponse(**{
-            "id": user.id,
-            "email": user.email,
-            "is_guest": user.is_guest,
-            "age": user.age,
-            "gender": user.gender,
-            "language": user.language,
-            "consent_given": user.consent_given,
-        })
-    )
+    return token_response(user)
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form.username).first()
-    if not user or not user.hashed_password or not verify_password(form.password, user.hashed_password):
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(models.User).where(models.User.email == form.username))
+    verified, new_hash = False, None
+    if user and user.hashed_password:
+        verified, new_hash = await verify_password(form.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="メールアドレスまたはパスワードが正しくありません"
         )
-    token = create_access_token({"sub": user.id})
-    return TokenResponse(
-        access_token=token,
-        token_type="bearer",
-        user=UserResponse(**{
-            "id": user.id,
-            "email": user.email,
-            "is_guest": user.is_guest,
-            "age": user.age,
-            "gender": user.gender,
-            "language": user.language,
-            "consent_given": user.consent_given,
-        })
-    )
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made
+        user.hashed_password = new_hash
+        async with single_writer():
+            await db.commit()
+    return token_response(user)
 
 
 @router.post("/guest", response_model=TokenResponse)
-def guest_login(req: GuestRequest, db: Session = Depends(get_db)):
-    guest_email = f"guest_{uuid.uuid4().hex[:8]}@pbcm.local"
-    user = models.User(
-        email=guest_email,
-        hashed_password=None,
-        is_guest=True,
-        language=req.language,
-        consent_given=True,
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+async def guest_login(req: GuestRequest, db: AsyncSession = Depends(get_async_db)):
+    if guests.GUEST_MODE == "memory":
+        # Nothing is written until the guest saves something (guests.ensure_persisted)
+        user = guests.new_guest(await guests.allocate_id(), req.language)
+    else:
+        guest_email = f"guest_{uuid.uuid4().hex[:8]}@pbcm.local"
+        user = models.User(
+            email=guest_email,
+            hashed_password=None,
+            is_guest=True,
+            language=req.language,
+            consent_given=True,
+        )
+        async with single_writer():
+            db.add(user)
+            await db.commit()
 
-    token = create_access_token({"sub": user.id})
-    return TokenResponse(
-        access_token=token,
-        token_type="bearer",
-        user=UserResponse(**{
-            "id": user.id,
-            "email": user.email,
-            "is_guest": user.is_guest,
-            "age": user.age,
-            "gender": user.gender,
-            "language": user.language,
-            "consent_given": user.consent_given,
-        })
-    )
+    return token_response(user)
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: models.User = Depends(get_current_user)):
-    return UserResponse(**{
-        "id": current_user.id,
-        "email": current_user.email,
-        "is_guest": current_user.is_guest,
-        "age": current_user.age,
-        "gender": current_user.gender,
-        "language": current_user.language,
-        "consent_given": current_user.consent_given,
-    })
+async def get_me(current_user: models.User = Depends(get_current_user_record)):
+    return model_response(UserResponse.model_validate(current_user))
 
 
 @router.put("/profile")
-def update_profile(
+async def update_profile(
     age: Optional[int] = None,
     gender: Optional[str] = None,
     language: Optional[str] = None,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(get_current_user_record),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if age is not None:
-        current_user.age = age
-    if gender is not None:
-        current_user.gender = gender
-    if language is not None:
-        current_user.language = language
-    db.commit()
-    return {"message": "プロフィールを更新しました"}
+    async with single_writer():
+        if inspect(current_user).transient:
+            # In-memory guest's first save: insert the row the way submits do (ON CONFLICT safe)
+            await guests.ensure_persisted(db, AuthUser.from_user(current_user))
+            current_user = await db.get(models.User, current_user.id)
+        if age is not None:
+            current_user.age = age
+        if gender is not None:
+            current_user.gender = gender
+        if language is not None:
+            current_user.language = language
+        await db.commit()
+    # Peer benchmarks and suggestion language depend on the profile
+    await response_cache.invalidate(current_user.id)
+    # Re-issue the token so its claims match, and overwrite the cached identity
+    return {"message": "プロフィールを更新しました", "access_token": create_user_token(current_user)}
@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+
+from cache import response_cache
+from database import get_async_db
+import ingest_queue
+import models
+from auth import AuthUser, get_current_user
+from pagination import MAX_PAGE_SIZE
+from routers.surveys import score_to_dict
+from population_stats import get_benchmark, get_percentiles
+from suggestions_data import get_all_suggestions
+
+router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
+
+
+@router.get("")
+async def get_dashboard(
+    request: Request,
+    limit: int = Query(12, ge=1, le=MAX_PAGE_SIZE),
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Everything the Dashboard page shows, from one indexed query on scores (or the response cache)."""
+    params = (limit, current_user.language)
+    cached = await response_cache.get(current_user.id, "dashboard", params)
+    if cached is None:
+        body, headers = await _build_dashboard(current_user, limit, db)
+        cached = await response_cache.put(current_user.id, "dashboard", body, params, headers=headers)
+    etag = cached.headers["etag"]
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return cached
+
+
+async def _build_dashboard(current_user: AuthUser, limit: int, db: AsyncSession):
+    """(body, headers) for get_dashboard."""
+    has_baseline = (
+        exists()
+        .where(
+            models.Score.user_id == current_user.id,
+            models.Score.survey_type == "baseline"
+        )
+        .label("has_baseline")
+    )
+    rows = (await db.execute(
+        select(models.Score, has_baseline)
+        .where(models.Score.user_id == current_user.id)
+        .order_by(models.Score.date.desc())
+        .limit(limit)
+    )).all()
+    scores = [s for s, _ in rows]
+    baseline = bool(rows[0][1]) if rows else False
+
+    # Submissions still in the ingest queue (already committed ones are skipped)
+    written = {(s.date, s.survey_type) for s in scores}
+    pending = [p for p in await ingest_queue.pending_scores(current_user.id) if (p.date, p.survey_type) not in written]
+    if pending:
+        scores = sorted(pending + scores, key=lambda s: s.date, reverse=True)[:limit]
+        baseline = baseline or any(p.survey_type == "baseline" for p in pending)
+
+    survey_type = scores[0].survey_type if scores else "baseline"
+    benchmark = get_benchmark(current_user.age_bracket, current_user.gender, survey_type)
+    percentiles = get_percentiles(current_user.age_bracket, current_user.gender, survey_type)
+
+    # Changes when a score is added or rescored, the peer benchmark moves, or the profile changes
+    window = ",".join(f"{s.id}/{s.total_score}" for s in scores)
+    tag = f"{current_user.id}:{limit}:{current_user.language}:{benchmark}:{percentiles}:{window}"
+    etag = f'W/"{hashlib.sha1(tag.encode()).hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if not scores:
+        return {"latest": None, "history": [], "has_baseline": False, "suggestions": []}, headers
+
+    latest = scores[0]
+    return {
+        "latest": {
+            **score_to_dict(latest),
+            "benchmark": benchmark,
+            "benchmark_percentiles": percentiles,
+        },
+        "history": [score_to_dict(s) for s in reversed(scores)],
+        "has_baseline": baseline,
+        "suggestions": get_all_suggestions(
+            drivers=latest.pillar1_score or 50,
+            health=latest.pillar2_score or 50,
+            skills=latest.pillar3_score or 50,
+            lang=current_user.language or "ja"
+        ),
+    }, headers
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from pathlib import Path
+import os
+import tempfile
+
+from database import SessionLocal, open_session
+from auth import AuthUser, get_current_user
+from export import DATASETS, MEDIA_TYPES, csv_chunk, user_statement, write_rows
+
+router = APIRouter(prefix="/api/exports", tags=["exports"])
+
+CHUNK_SIZE = 1000
+
+
+async def _csv_body(stmt, columns):
+    # Own session: the response body is produced after the request's session has closed
+    async with open_session() as db:
+        yield csv_chunk((), [c.name for c in columns])
+        result = await db.stream(stmt.execution_options(yield_per=CHUNK_SIZE))
+        async for rows in result.partitions(CHUNK_SIZE):
+            yield csv_chunk(rows)
+
+
+def _write_parquet(stmt, columns) -> Path:
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    db = SessionLocal()
+    try:
+        write_rows(db, stmt, columns, "parquet", Path(path), CHUNK_SIZE)
+    except Exception:
+        os.unlink(path)
+        raise
+    finally:
+        db.close()
+    return Path(path)
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str,
+    output: str = Query("csv", alias="format", pattern="^(csv|parquet)$"),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """Full history of one table for the current user: survey_responses, test_results or scores."""
+    if dataset not in DATASETS:
+        raise HTTPException(status_code=404, detail="データセットが見つかりません")
+    stmt = user_statement(dataset, current_user.id)
+    columns = list(DATASETS[dataset].columns)
+    headers = {"Content-Disposition": f"attachment; filename=pbcm_{dataset}.{output}"}
+
+    if output == "csv":
+        return StreamingResponse(_csv_body(stmt, columns), media_type=MEDIA_TYPES["csv"], headers=headers)
+
+    # Parquet needs its footer written last, so build the file off the event loop, then stream it
+    path = await run_in_threadpool(_write_parquet, stmt, columns)
+    return FileResponse(
+        path, media_type=MEDIA_TYPES["parquet"], headers=headers,
+        background=BackgroundTask(os.unlink, path),
+    )
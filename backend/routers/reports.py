@@ -1,18 +1,48 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from concurrent.futures import Executor, ProcessPoolExecutor
 from io import BytesIO
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+import asyncio
+import hashlib
+import os
 
-from database import get_db
+from admission import Pool
+from database import get_async_db
 import models
-from auth import get_current_user
+from auth import AuthUser, get_current_user
+from score_store import get_latest_score
 from suggestions_data import get_all_suggestions
+import ingest_queue
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
+PDF_CACHE_DIR = Path(os.getenv("PDF_CACHE_DIR", "./pdf_cache"))
+# 0 renders in the default threadpool instead of a separate process
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+# Renders in flight at once, and how many more may wait before new ones get 503
+PDF_CONCURRENCY = int(os.getenv("PDF_CONCURRENCY", str(max(1, PDF_WORKERS))))
+PDF_QUEUE = int(os.getenv("PDF_QUEUE", "8"))
 
-def create_pdf_report(user: models.User, scores: list, suggestions: list) -> bytes:
+_executor: Optional[Executor] = None
+_pool = Pool("pdf", PDF_CONCURRENCY, PDF_QUEUE, retry_after=5)
+# job_id -> in-flight render, so concurrent requests for the same report share one
+_jobs: Dict[str, "asyncio.Future"] = {}
+
+
+class ReportScore(NamedTuple):
+    date: datetime
+    pillar1_score: Optional[float]
+    pillar2_score: Optional[float]
+    pillar3_score: Optional[float]
+    total_score: Optional[float]
+
+
+def create_pdf_report(user: AuthUser, scores: list, suggestions: list) -> bytes:
     from reportlab.lib.pagesizes import A4
     from reportlab.lib import colors
     from reportlab.lib.units import mm
@@ -111,32 +141,187 @@ def create_pdf_report(user: models.User, scores: list, suggestions: list) -> byt
     return buf.read()
 
 
-@router.get("/pdf")
-def download_pdf(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    scores = (
-        db.query(models.Score)
-        .filter(models.Score.user_id == current_user.id)
-        .order_by(models.Score.date.asc())
-        .all()
-    )
+def _render_to_file(path: str, user: AuthUser, scores: list, suggestions: list) -> None:
+    """Runs in the PDF worker: render, write atomically, drop reports a newer score replaced."""
+    pdf_bytes = create_pdf_report(user, scores, suggestions)
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(pdf_bytes)
+    os.replace(tmp, target)
+    # Same language and an older latest score only (job ids sort by score date);
+    # other languages' reports and newer renders that finished first are kept
+    lang, stamp, _ = target.stem.split("-")
+    for old in target.parent.glob(f"{lang}-*.pdf"):
+        if old.stem.split("-")[1] < stamp:
+            old.unlink(missing_ok=True)
+
+
+def _get_executor() -> Optional[Executor]:
+    global _executor
+    if _executor is None and PDF_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _executor
+
+
+def _load_reportlab() -> None:
+    import reportlab.platypus  # noqa: F401
+    import reportlab.pdfbase.ttfonts  # noqa: F401
+
+
+async def warm_up() -> None:
+    """Start the render pool and import reportlab in it ahead of the first report."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_get_executor(), _load_reportlab)
+
+
+def shutdown_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def _report_lang(user: AuthUser) -> str:
+    # Suggestions fall back to Japanese for any other language
+    return user.language if user.language in ("ja", "en") else "ja"
+
+
+def _job_id(user_id: int, latest: Optional[models.UserLatestScore], lang: str) -> str:
+    """lang-stamp-hash: keyed on the latest score's date and total, which are set
+    for queued submissions too (score_id is not until they are written)."""
+    if latest is None:
+        return f"{lang}-{0:020d}-{hashlib.sha1(f'{user_id}:{lang}'.encode()).hexdigest()[:12]}"
+    key = f"{user_id}:{latest.date.isoformat()}:{latest.survey_type}:{latest.total_score}:{lang}"
+    return f"{lang}-{latest.date:%Y%m%d%H%M%S%f}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"
+
+
+def _report_path(user_id: int, job_id: str) -> Path:
+    return PDF_CACHE_DIR / str(user_id) / f"{job_id}.pdf"
+
+
+def _job_status(user_id: int, job_id: str) -> str:
+    if _report_path(user_id, job_id).exists():
+        return "done"
+    job = _jobs.get(job_id)
+    if job is None:
+        return "missing"
+    if job.done() and job.exception() is not None:
+        return "error"
+    return "pending"
+
+
+async def _start_job(current_user: AuthUser, db: AsyncSession) -> str:
+    """Start (or join) the render for the user's latest score; returns the job id."""
+    latest = await get_latest_score(db, current_user.id)
+    lang = _report_lang(current_user)
+    job_id = _job_id(current_user.id, latest, lang)
+    path = _report_path(current_user.id, job_id)
+    if path.exists() or (job_id in _jobs and not _jobs[job_id].done()):
+        return job_id
+
+    # Held until the render finishes; may have waited while another request started this job
+    await _pool.acquire()
+    if path.exists() or (job_id in _jobs and not _jobs[job_id].done()):
+        _pool.release()
+        return job_id
+    try:
+        await _submit_render(current_user, db, job_id, path, lang)
+    except BaseException:
+        _pool.release()
+        raise
+    return job_id
+
+
+async def _submit_render(current_user: AuthUser, db: AsyncSession, job_id: str, path: Path, lang: str) -> None:
+    """Read the report's data and start rendering; the render releases the pool slot when done."""
+    # The report only shows the last 6 records, so read just those (newest first)
+    rows = (await db.scalars(
+        select(models.Score)
+        .where(models.Score.user_id == current_user.id)
+        .order_by(models.Score.date.desc())
+        .limit(6)
+    )).all()
+    # Plus submissions still in the ingest queue, as the job id already counts them
+    written = {(s.date, s.survey_type) for s in rows}
+    pending = [p for p in await ingest_queue.pending_scores(current_user.id) if (p.date, p.survey_type) not in written]
+    if pending:
+        rows = sorted(pending + list(rows), key=lambda s: s.date, reverse=True)[:6]
+    scores = [
+        ReportScore(s.date, s.pillar1_score, s.pillar2_score, s.pillar3_score, s.total_score)
+        for s in reversed(rows)
+    ]
 
-    latest = scores[-1] if scores else None
     suggestions = []
-    if latest:
+    if scores:
         suggestions = get_all_suggestions(
-            drivers=latest.pillar1_score or 50,
-            health=latest.pillar2_score or 50,
-            skills=latest.pillar3_score or 50,
-            lang=current_user.language or "ja"
+            drivers=scores[-1].pillar1_score or 50,
+            health=scores[-1].pillar2_score or 50,
+            skills=scores[-1].pillar3_score or 50,
+            lang=lang
         )
 
-    pdf_bytes = create_pdf_report(current_user, scores, suggestions)
+    loop = asyncio.get_running_loop()
+    job = loop.run_in_executor(
+        _get_executor(), _render_to_file, str(path), current_user, scores, suggestions
+    )
+    _jobs[job_id] = job
+
+    def _finished(f: "asyncio.Future") -> None:
+        _pool.release()
+        # Failed jobs stay registered so their status reads "error" until retried
+        if not f.cancelled() and f.exception() is None:
+            _jobs.pop(job_id, None)
+
+    job.add_done_callback(_finished)
+
 
-    return StreamingResponse(
-        BytesIO(pdf_bytes),
+def _file_response(path: Path) -> FileResponse:
+    # FileResponse streams the cached file in chunks
+    return FileResponse(
+        path,
         media_type="application/pdf",
         headers={"Content-Disposition": "attachment; filename=pbcm_report.pdf"}
     )
+
+
+@router.get("/pdf")
+async def download_pdf(
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # A newer score's render may remove the file before it is served; start over once
+    for _ in range(2):
+        job_id = await _start_job(current_user, db)
+        job = _jobs.get(job_id)
+        if job is not None:
+            await asyncio.shield(job)
+        path = _report_path(current_user.id, job_id)
+        if path.exists():
+            return _file_response(path)
+    raise HTTPException(status_code=503, detail="レポートを生成できませんでした。再度お試しください", headers={"Retry-After": "5"})
+
+
+@router.post("/pdf/jobs", status_code=202)
+async def create_pdf_job(
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    job_id = await _start_job(current_user, db)
+    return {"job_id": job_id, "status": _job_status(current_user.id, job_id)}
+
+
+@router.get("/pdf/jobs/{job_id}")
+async def get_pdf_job(job_id: str, current_user: AuthUser = Depends(get_current_user)):
+    status = _job_status(current_user.id, job_id)
+    if status == "missing":
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    return {"job_id": job_id, "status": status}
+
+
+@router.get("/pdf/jobs/{job_id}/download")
+async def download_pdf_job(job_id: str, current_user: AuthUser = Depends(get_current_user)):
+    path = _report_path(current_user.id, job_id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="レポートはまだ生成されていません")
+    return _file_response(path)
@@ -1,34 +1,33 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
-import models
-from auth import get_current_user
-from suggestions_data import get_all_suggestions
+from cache import response_cache
+from database import get_async_db
+from score_store import get_latest_score
+from auth import AuthUser, get_current_user
+from suggestions_data import get_all_suggestions_json
 
 router = APIRouter(prefix="/api/suggestions", tags=["suggestions"])
 
 
 @router.get("/")
-def get_suggestions(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_suggestions(
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    latest_score = (
-        db.query(models.Score)
-        .filter(models.Score.user_id == current_user.id)
-        .order_by(models.Score.date.desc())
-        .first()
-    )
+    lang = current_user.language or "ja"
+    cached = await response_cache.get(current_user.id, "suggestions", (lang,))
+    if cached is not None:
+        return cached
+    latest_score = await get_latest_score(db, current_user.id)
     if not latest_score:
-        return []
+        return await response_cache.put(current_user.id, "suggestions", [], (lang,))
 
-    lang = current_user.language or "ja"
-    suggestions = get_all_suggestions(
+    # Pre-serialized fragments, memoized per score bucket; skips the jsonable_encoder pass
+    body = get_all_suggestions_json(
         drivers=latest_score.pillar1_score or 50,
         health=latest_score.pillar2_score or 50,
         skills=latest_score.pillar3_score or 50,
         lang=lang
     )
-    return suggestions
+    return await response_cache.put(current_user.id, "suggestions", body, (lang,))
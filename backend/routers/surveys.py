@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Dict, List, Optional
+from typing import Dict, Optional
 from datetime import datetime
 
-from database import get_db
+from cache import response_cache
+from database import get_async_db, single_writer
+from guests import ensure_persisted
+import ingest_queue
 import models
-from auth import get_current_user
+from auth import AuthUser, get_current_user
+from pagination import MAX_PAGE_SIZE, keyset_page, ndjson_response, set_next_cursor
+from population_stats import get_benchmark
+from score_store import get_latest_score, latest_to_dict, observe_score, save_score
+from serialization import model_response, rows_json
 from scoring import (
     calculate_pillar1_score, calculate_pillar2_score, calculate_pillar3_score,
-    total_score, get_benchmark
+    total_score
 )
 
 router = APIRouter(prefix="/api/surveys", tags=["surveys"])
@@ -37,51 +45,64 @@ class ScoreResponse(BaseModel):
     date: str
 
 
+SCORE_FIELDS = (
+    "id", "date", "survey_type", "pillar1_score", "pillar2_score", "pillar3_score", "total_score"
+)
+
+
+def score_to_dict(s: models.Score) -> dict:
+    # `date` stays a datetime; serialization.dumps writes it as ISO 8601
+    return {f: getattr(s, f) for f in SCORE_FIELDS}
+
+
 @router.post("/submit")
-def submit_survey(
+async def submit_survey(
     req: SurveySubmitRequest,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    for item_id, score in req.responses.items():
-        response = models.SurveyResponse(
-            user_id=current_user.id,
-            survey_type=req.survey_type,
-            pillar=req.pillar,
-            item_id=item_id,
-            score=score
-        )
-        db.add(response)
-    db.commit()
+    if req.responses:
+        async with single_writer():
+            await ensure_persisted(db, current_user)
+            await db.execute(insert(models.SurveyResponse), [
+                {
+                    "user_id": current_user.id,
+                    "survey_type": req.survey_type,
+                    "pillar": req.pillar,
+                    "item_id": item_id,
+                    "score": score,
+                }
+                for item_id, score in req.responses.items()
+            ])
+            await db.commit()
+        await response_cache.invalidate(current_user.id)
     return {"message": "保存しました"}
 
 
 @router.post("/submit-batch", response_model=ScoreResponse)
-def submit_batch(
+async def submit_batch(
     req: SurveyBatchRequest,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     now = datetime.utcnow()
 
-    # Save all survey responses
-    for pillar_key, pillar_name in [
-        ("drivers", "drivers"),
-        ("health", "health"),
-        ("skills_survey", "skills")
-    ]:
-        pillar_data = getattr(req, pillar_key, None)
-        if pillar_data:
-            for item_id, score in pillar_data.items():
-                response = models.SurveyResponse(
-                    user_id=current_user.id,
-                    survey_type=req.survey_type,
-                    pillar=pillar_name,
-                    item_id=item_id,
-                    score=score,
-                    timestamp=now
-                )
-                db.add(response)
+    response_rows = [
+        {
+            "user_id": current_user.id,
+            "survey_type": req.survey_type,
+            "pillar": pillar_name,
+            "item_id": item_id,
+            "score": score,
+            "timestamp": now,
+        }
+        for pillar_key, pillar_name in [
+            ("drivers", "drivers"),
+            ("health", "health"),
+            ("skills_survey", "skills")
+        ]
+        for item_id, score in (getattr(req, pillar_key, None) or {}).items()
+    ]
 
     # Calculate scores
     p1 = calculate_pillar1_score(req.drivers or {}) if req.drivers else None
@@ -92,12 +113,7 @@ def submit_batch(
 
     # For weekly: only drivers, keep previous health/skills
     if req.survey_type == "weekly":
-        last_score = (
-            db.query(models.Score)
-            .filter(models.Score.user_id == current_user.id)
-            .order_by(models.Score.date.desc())
-            .first()
-        )
+        last_score = await get_latest_score(db, current_user.id)
         if last_score:
             if p2 is None:
                 p2 = last_score.pillar2_score
@@ -108,94 +124,163 @@ def submit_batch(
     if p1 is not None and p2 is not None and p3 is not None:
         t_score = total_score(p1, p2, p3)
 
-    # Save score record
-    score_record = models.Score(
-        user_id=current_user.id,
-        date=now,
-        survey_type=req.survey_type,
-        pillar1_score=p1,
-        pillar2_score=p2,
-        pillar3_score=p3,
-        total_score=t_score
-    )
-    db.add(score_record)
-    db.commit()
+    if ingest_queue.enabled():
+        # Acknowledge once durably queued; the background writer commits it
+        await ingest_queue.enqueue(current_user, now, req.survey_type, response_rows, {
+            "pillar1_score": p1,
+            "pillar2_score": p2,
+            "pillar3_score": p3,
+            "total_score": t_score,
+        })
+    else:
+        async with single_writer():
+            await ensure_persisted(db, current_user)
+            # Save responses (one executemany) and the score record in the same transaction
+            if response_rows:
+                await db.execute(insert(models.SurveyResponse), response_rows)
+            await save_score(
+                db,
+                user=current_user,
+                date=now,
+                survey_type=req.survey_type,
+                pillar1_score=p1,
+                pillar2_score=p2,
+                pillar3_score=p3,
+                total_score=t_score
+            )
+            await db.commit()
+        observe_score(current_user, req.survey_type, p1, p2, p3, t_score)
+    await response_cache.invalidate(current_user.id)
 
-    benchmark = get_benchmark(current_user.age)
-    return ScoreResponse(
+    benchmark = get_benchmark(current_user.age_bracket, current_user.gender, req.survey_type)
+    return model_response(ScoreResponse(
         pillar1_score=p1,
         pillar2_score=p2,
         pillar3_score=p3,
         total_score=t_score,
         benchmark=benchmark,
         date=now.isoformat()
-    )
+    ))
 
 
 @router.get("/history")
-def get_history(
-    limit: int = 12,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_history(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    output: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: Optional[int] = Query(None, ge=3, le=2000),
+    bucket: Optional[str] = Query(None, pattern="^(week|month|auto)$"),
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    scores = (
-        db.query(models.Score)
-        .filter(models.Score.user_id == current_user.id)
-        .order_by(models.Score.date.desc())
-        .limit(limit)
-        .all()
+    """
+    The `limit` scores before `cursor` (default: the latest 12), oldest first.
+    X-Next-Cursor pages further back. format=ndjson streams all of them
+    (or `limit`), newest first. `start` / `end` restrict the date range.
+
+    For charts over long ranges, `points` and/or `bucket` return a fixed-size
+    series instead (see downsample.py): `points` alone keeps that many scores
+    by LTTB; `bucket=week|month` gives min/mean/max per pillar per calendar
+    bucket; `bucket=auto&points=N` splits the range into N equal buckets.
+    """
+    in_range = [models.Score.user_id == current_user.id]
+    if start:
+        in_range.append(models.Score.date >= start)
+    if end:
+        in_range.append(models.Score.date < end)
+
+    if points or bucket:
+        return await _history_series(current_user, db, in_range, start, end, points, bucket)
+
+    if output == "ndjson":
+        table = models.Score.__table__
+        stmt = keyset_page(select(table).where(*in_range), table.c.date, table.c.id, cursor)
+        return ndjson_response(stmt.limit(limit) if limit else stmt, score_to_dict)
+
+    limit = limit or 12
+    params = (limit, cursor, start, end)
+    cached = await response_cache.get(current_user.id, "surveys.history", params)
+    if cached is not None:
+        return cached
+    # Plain rows of just the response columns, serialized straight to bytes
+    table = models.Score.__table__
+    scores = (await db.execute(keyset_page(
+        select(*(table.c[f] for f in SCORE_FIELDS)).where(*in_range), table.c.date, table.c.id, cursor,
+    ).limit(limit))).all()
+    set_next_cursor(response, scores, limit, "date")
+    return await response_cache.put(
+        current_user.id, "surveys.history", rows_json(reversed(scores), SCORE_FIELDS),
+        params, headers=response.headers,
     )
-    return [
-        {
-            "id": s.id,
-            "date": s.date.isoformat(),
-            "survey_type": s.survey_type,
-            "pillar1_score": s.pillar1_score,
-            "pillar2_score": s.pillar2_score,
-            "pillar3_score": s.pillar3_score,
-            "total_score": s.total_score,
+
+
+async def _history_series(current_user: AuthUser, db: AsyncSession, in_range: list,
+                          start: Optional[datetime], end: Optional[datetime],
+                          points: Optional[int], bucket: Optional[str]):
+    if bucket == "auto" and not points:
+        raise HTTPException(status_code=400, detail="bucket=auto には points を指定してください")
+    params = (start, end, points, bucket)
+    cached = await response_cache.get(current_user.id, "surveys.history_series", params)
+    if cached is not None:
+        return cached
+
+    # Only the charted columns, in date order, over the (user_id, date) index
+    rows = (await db.execute(
+        select(
+            models.Score.id, models.Score.date, models.Score.survey_type,
+            models.Score.pillar1_score, models.Score.pillar2_score,
+            models.Score.pillar3_score, models.Score.total_score,
+        )
+        .where(*in_range)
+        .order_by(models.Score.date, models.Score.id)
+    )).all()
+
+    import downsample
+
+    if bucket:
+        series_start = start or (rows[0].date if rows else datetime.utcnow())
+        series_end = end or datetime.utcnow()
+        body = {
+            "mode": "bucket",
+            "bucket": bucket,
+            "count": len(rows),
+            "points": downsample.buckets(rows, bucket, series_start, series_end, points or 0),
         }
-        for s in reversed(scores)
-    ]
+    else:
+        body = {
+            "mode": "lttb",
+            "count": len(rows),
+            "points": [score_to_dict(r) for r in downsample.lttb(rows, points)],
+        }
+    return await response_cache.put(current_user.id, "surveys.history_series", body, params)
 
 
 @router.get("/latest")
-def get_latest(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_latest(
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    score = (
-        db.query(models.Score)
-        .filter(models.Score.user_id == current_user.id)
-        .order_by(models.Score.date.desc())
-        .first()
+    cached = await response_cache.get(current_user.id, "surveys.latest")
+    if cached is not None:
+        return cached
+    latest = await get_latest_score(db, current_user.id)
+    return await response_cache.put(
+        current_user.id, "surveys.latest", latest_to_dict(latest, current_user) if latest else None
     )
-    if not score:
-        return None
-    benchmark = get_benchmark(current_user.age)
-    return {
-        "id": score.id,
-        "date": score.date.isoformat(),
-        "survey_type": score.survey_type,
-        "pillar1_score": score.pillar1_score,
-        "pillar2_score": score.pillar2_score,
-        "pillar3_score": score.pillar3_score,
-        "total_score": score.total_score,
-        "benchmark": benchmark,
-    }
 
 
 @router.get("/has-baseline")
-def has_baseline(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def has_baseline(
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    exists = (
-        db.query(models.Score)
-        .filter(
-            models.Score.user_id == current_user.id,
-            models.Score.survey_type == "baseline"
-        )
-        .first()
+    cached = await response_cache.get(current_user.id, "surveys.has_baseline")
+    if cached is not None:
+        return cached
+    latest = await get_latest_score(db, current_user.id)
+    return await response_cache.put(
+        current_user.id, "surveys.has_baseline", {"has_baseline": bool(latest and latest.has_baseline)}
     )
-    return {"has_baseline": exists is not None}
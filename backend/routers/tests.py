@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
-from database import get_db
+from cache import response_cache
+from database import get_async_db, single_writer
+from guests import ensure_persisted
 import models
-from auth import get_current_user
+from auth import AuthUser, get_current_user
+from pagination import MAX_PAGE_SIZE, keyset_page, ndjson_response, set_next_cursor
+from serialization import model_response, rows_json
 from scoring import (
     normalize_test_score_attention,
     normalize_test_score_memory,
@@ -48,86 +53,196 @@ class TestScoreResponse(BaseModel):
     pillar3_score: float
 
 
+class TrialBlock(BaseModel):
+    rt_ms: str  # base64 of little-endian int16 per trial, -1 = no response
+    flags: str  # base64 of uint8 per trial: 1 = correct, 2 = congruent (Stroop)
+
+
+class CognitiveTrialBatch(BaseModel):
+    attention: Optional[TrialBlock] = None
+    memory: Optional[MemoryTestResult] = None
+    flexibility: Optional[TrialBlock] = None
+    skills_survey: Optional[dict] = None
+
+
+class TrialScoreResponse(TestScoreResponse):
+    trial_stats: Dict[str, dict]
+
+
 @router.post("/submit", response_model=TestScoreResponse)
-def submit_tests(
+async def submit_tests(
     req: CognitiveTestBatch,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     now = datetime.utcnow()
     test_results = {}
+    rows = []
 
     if req.attention:
         score = normalize_test_score_attention(
             req.attention.avg_reaction_ms, req.attention.correct_rate
         )
-        db.add(models.TestResult(
-            user_id=current_user.id,
-            timestamp=now,
-            test_type="attention",
-            raw_score=req.attention.avg_reaction_ms,
-            normalized_score=score
-        ))
+        rows.append({
+            "user_id": current_user.id,
+            "timestamp": now,
+            "test_type": "attention",
+            "raw_score": req.attention.avg_reaction_ms,
+            "normalized_score": score,
+        })
         test_results["attention"] = score
 
     if req.memory:
         score = normalize_test_score_memory(
             req.memory.correct_count, req.memory.total_trials
         )
-        db.add(models.TestResult(
-            user_id=current_user.id,
-            timestamp=now,
-            test_type="memory",
-            raw_score=req.memory.correct_count,
-            normalized_score=score
-        ))
+        rows.append({
+            "user_id": current_user.id,
+            "timestamp": now,
+            "test_type": "memory",
+            "raw_score": req.memory.correct_count,
+            "normalized_score": score,
+        })
         test_results["memory"] = score
 
     if req.flexibility:
         score = normalize_test_score_flexibility(
             req.flexibility.avg_reaction_ms, req.flexibility.correct_rate
         )
-        db.add(models.TestResult(
-            user_id=current_user.id,
-            timestamp=now,
-            test_type="flexibility",
-            raw_score=req.flexibility.avg_reaction_ms,
-            normalized_score=score
-        ))
+        rows.append({
+            "user_id": current_user.id,
+            "timestamp": now,
+            "test_type": "flexibility",
+            "raw_score": req.flexibility.avg_reaction_ms,
+            "normalized_score": score,
+        })
         test_results["flexibility"] = score
 
-    db.commit()
+    if rows:
+        async with single_writer():
+            await ensure_persisted(db, current_user)
+            await db.execute(insert(models.TestResult), rows)
+            await db.commit()
+        await response_cache.invalidate(current_user.id)
 
     p3 = calculate_pillar3_score(req.skills_survey or {}, test_results)
 
-    return TestScoreResponse(
+    return model_response(TestScoreResponse(
         attention_score=test_results.get("attention"),
         memory_score=test_results.get("memory"),
         flexibility_score=test_results.get("flexibility"),
         pillar3_score=p3
-    )
+    ))
+
+
+@router.post("/submit-trials", response_model=TrialScoreResponse)
+async def submit_trials(
+    req: CognitiveTrialBatch,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Per-trial submission: scored server-side, and the trials kept for later rescoring."""
+    # NumPy is only needed here; keep it out of API startup
+    from trial_scoring import decode_trials, trial_results
+
+    blocks = {name: getattr(req, name) for name in ("attention", "flexibility") if getattr(req, name)}
+    try:
+        packed = {name: decode_trials(b.rt_ms, b.flags) for name, b in blocks.items()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"試行データが不正です: {e}")
+
+    now = datetime.utcnow()
+    test_results, trial_stats, rows = {}, {}, []
+    for name, result in zip(packed, trial_results(list(packed), list(packed.values()))):
+        rows.append({
+            "user_id": current_user.id,
+            "timestamp": now,
+            "test_type": name,
+            "raw_score": result["raw_score"],
+            "normalized_score": result["normalized_score"],
+        })
+        test_results[name] = result["normalized_score"]
+        trial_stats[name] = result["stats"]
+    if req.memory:
+        score = normalize_test_score_memory(req.memory.correct_count, req.memory.total_trials)
+        rows.append({
+            "user_id": current_user.id,
+            "timestamp": now,
+            "test_type": "memory",
+            "raw_score": req.memory.correct_count,
+            "normalized_score": score,
+        })
+        test_results["memory"] = score
+
+    if rows:
+        async with single_writer():
+            await ensure_persisted(db, current_user)
+            ids = (await db.scalars(
+                insert(models.TestResult).returning(models.TestResult.id, sort_by_parameter_order=True),
+                rows,
+            )).all()
+            if packed:
+                await db.execute(insert(models.TestTrials), [
+                    {
+                        "test_result_id": result_id,
+                        "user_id": current_user.id,
+                        "n_trials": len(flags),
+                        "rt_ms": rt,
+                        "flags": flags,
+                        "stats": trial_stats[name],
+                    }
+                    for result_id, (name, (rt, flags)) in zip(ids, packed.items())
+                ])
+            await db.commit()
+        await response_cache.invalidate(current_user.id)
+
+    return model_response(TrialScoreResponse(
+        attention_score=test_results.get("attention"),
+        memory_score=test_results.get("memory"),
+        flexibility_score=test_results.get("flexibility"),
+        pillar3_score=calculate_pillar3_score(req.skills_survey or {}, test_results),
+        trial_stats=trial_stats,
+    ))
+
+
+RESULT_FIELDS = ("id", "timestamp", "test_type", "raw_score", "normalized_score")
+
+
+def result_to_dict(r: models.TestResult) -> dict:
+    return {f: getattr(r, f) for f in RESULT_FIELDS}
 
 
 @router.get("/history")
-def get_test_history(
-    limit: int = 10,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_test_history(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    output: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    results = (
-        db.query(models.TestResult)
-        .filter(models.TestResult.user_id == current_user.id)
-        .order_by(models.TestResult.timestamp.desc())
-        .limit(limit)
-        .all()
+    """
+    The `limit` results before `cursor` (default: the latest 10), newest first.
+    X-Next-Cursor pages further back. format=ndjson streams all of them (or `limit`).
+    """
+    if output == "ndjson":
+        table = models.TestResult.__table__
+        stmt = keyset_page(
+            select(table).where(table.c.user_id == current_user.id), table.c.timestamp, table.c.id, cursor
+        )
+        return ndjson_response(stmt.limit(limit) if limit else stmt, result_to_dict)
+
+    limit = limit or 10
+    cached = await response_cache.get(current_user.id, "tests.history", (limit, cursor))
+    if cached is not None:
+        return cached
+    table = models.TestResult.__table__
+    results = (await db.execute(keyset_page(
+        select(*(table.c[f] for f in RESULT_FIELDS)).where(table.c.user_id == current_user.id),
+        table.c.timestamp, table.c.id, cursor,
+    ).limit(limit))).all()
+    set_next_cursor(response, results, limit, "timestamp")
+    return await response_cache.put(
+        current_user.id, "tests.history", rows_json(results, RESULT_FIELDS),
+        (limit, cursor), headers=response.headers,
     )
-    return [
-        {
-            "id": r.id,
-            "timestamp": r.timestamp.isoformat(),
-            "test_type": r.test_type,
-            "raw_score": r.raw_score,
-            "normalized_score": r.normalized_score,
-        }
-        for r in results
-    ]
@@ -0,0 +1,132 @@
+"""
+Score writes and the per-user "latest score" row that reads use instead of
+ORDER BY date DESC LIMIT 1 over the whole history.
+"""
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import engine
+from auth import AuthUser
+from population_stats import get_benchmark, get_percentiles, population
+import ingest_queue
+import models
+
+_dialect_insert = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}.get(engine.dialect.name)
+
+
+async def save_score(
+    db,
+    user: AuthUser,
+    date: datetime,
+    survey_type: str,
+    pillar1_score: Optional[float],
+    pillar2_score: Optional[float],
+    pillar3_score: Optional[float],
+    total_score: Optional[float],
+) -> int:
+    """Insert a Score row and refresh user_latest_score.
+
+    The caller commits, then calls observe_score() so that only committed scores
+    reach the population stats.
+    """
+    user_id = user.id
+    values = dict(
+        date=date,
+        survey_type=survey_type,
+        pillar1_score=pillar1_score,
+        pillar2_score=pillar2_score,
+        pillar3_score=pillar3_score,
+        total_score=total_score,
+    )
+    result = await db.execute(insert(models.Score).values(user_id=user_id, **values))
+    score_id = result.inserted_primary_key[0]
+
+    latest = dict(
+        values,
+        score_id=score_id,
+        has_baseline=survey_type == "baseline",
+        benchmark_bracket=user.age_bracket,
+        benchmark=get_benchmark(user.age_bracket, user.gender, survey_type),
+    )
+    table = models.UserLatestScore.__table__
+    if _dialect_insert is not None:
+        stmt = _dialect_insert(table).values(user_id=user_id, **latest)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                **{k: stmt.excluded[k] for k in latest if k != "has_baseline"},
+                "has_baseline": table.c.has_baseline | stmt.excluded.has_baseline,
+            },
+            where=table.c.date <= stmt.excluded.date,
+        ))
+        return score_id
+
+    existing = await db.get(models.UserLatestScore, user_id)
+    if existing is None:
+        db.add(models.UserLatestScore(user_id=user_id, **latest))
+    elif existing.date <= date:
+        latest["has_baseline"] = existing.has_baseline or latest["has_baseline"]
+        await db.execute(
+            update(models.UserLatestScore)
+            .where(models.UserLatestScore.user_id == user_id)
+            .values(**latest)
+        )
+    return score_id
+
+
+def observe_score(
+    user: AuthUser,
+    survey_type: str,
+    pillar1_score: Optional[float],
+    pillar2_score: Optional[float],
+    pillar3_score: Optional[float],
+    total_score: Optional[float],
+) -> None:
+    """Feed a committed score to the population stats."""
+    population.observe(user.age_bracket, user.gender, survey_type, {
+        "drivers": pillar1_score,
+        "health": pillar2_score,
+        "skills": pillar3_score,
+        "total": total_score,
+    })
+
+
+async def get_latest_score(db, user_id: int) -> Optional[models.UserLatestScore]:
+    """The user's latest score, including submissions still in the ingest queue."""
+    latest = await db.get(models.UserLatestScore, user_id)
+    pending = await ingest_queue.pending_scores(user_id)
+    if not pending or (latest is not None and latest.date >= pending[0].date):
+        return latest
+    newest = pending[0]
+    # Transient row (never added to the session); score_id is unknown until written
+    return models.UserLatestScore(
+        user_id=user_id,
+        score_id=None,
+        date=newest.date,
+        survey_type=newest.survey_type,
+        pillar1_score=newest.pillar1_score,
+        pillar2_score=newest.pillar2_score,
+        pillar3_score=newest.pillar3_score,
+        total_score=newest.total_score,
+        has_baseline=bool(latest and latest.has_baseline) or any(p.survey_type == "baseline" for p in pending),
+        benchmark_bracket=latest.benchmark_bracket if latest else None,
+        benchmark=latest.benchmark if latest else None,
+    )
+
+
+def latest_to_dict(latest: models.UserLatestScore, user: AuthUser) -> Dict:
+    """Same shape as /surveys/latest, with live peer benchmarks for the user's group."""
+    return {
+        "id": latest.score_id,
+        "date": latest.date,
+        "survey_type": latest.survey_type,
+        "pillar1_score": latest.pillar1_score,
+        "pillar2_score": latest.pillar2_score,
+        "pillar3_score": latest.pillar3_score,
+        "total_score": latest.total_score,
+        "benchmark": get_benchmark(user.age_bracket, user.gender, latest.survey_type),
+        "benchmark_percentiles": get_percentiles(user.age_bracket, user.gender, latest.survey_type),
+    }
@@ -1,16 +1,27 @@
 from typing import List, Optional, Dict
 
+# Answer scales (min, max); batch_scoring.py vectorizes the same normalization
+LIKERT_RANGE = (1, 5)
+PHQ_GAD_RANGE = (0, 3)  # 0=best
+STRESS_RANGE = (1, 10)  # lower = better
+STRESS_ITEM = "h7"
 
-def normalize_score(raw: float, min_val: float = 1, max_val: float = 5) -> float:
+
+def normalize_score(raw: float, min_val: float = LIKERT_RANGE[0], max_val: float = LIKERT_RANGE[1]) -> float:
     """Normalize a raw score (1-5 scale) to 0-100."""
     return max(0, min(100, ((raw - min_val) / (max_val - min_val)) * 100))
 
 
-def normalize_reverse(raw: float, min_val: float = 1, max_val: float = 5) -> float:
+def normalize_reverse(raw: float, min_val: float = LIKERT_RANGE[0], max_val: float = LIKERT_RANGE[1]) -> float:
     """Normalize a reversed score (higher raw = lower score)."""
     return normalize_score(max_val - raw + min_val, min_val, max_val)
 
 
+def normalize_inverted(raw: float, min_val: float, max_val: float) -> float:
+    """Normalize a scale where min_val is best (PHQ/GAD, stress) to 0-100."""
+    return max(0, min(100, (1 - (raw - min_val) / (max_val - min_val)) * 100))
+
+
 def pillar_score(item_scores: List[float], weights: Optional[List[float]] = None) -> float:
     """Calculate weighted pillar score (0-100)."""
     if not item_scores:
@@ -32,6 +43,9 @@ def total_score(drivers: float, health: float, skills: float) -> float:
 # Reverse-scored items (higher raw answer = lower brain capital score)
 REVERSE_ITEMS = {"d4", "d5"}  # noise/pollution exposure, screen time
 
+# PHQ/GAD items in the health pillar (0-3 scale, 0=best)
+PHQ_GAD_ITEMS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
 
 def calculate_pillar1_score(responses: Dict[str, float]) -> float:
     """Calculate Pillar 1 (Brain Capital Drivers) score from survey responses."""
@@ -50,16 +64,13 @@ def calculate_pillar2_score(responses: Dict[str, float]) -> float:
     Custom items: 5-scale where lower = better for stress.
     """
     scores = []
-    phq_gad_items = {"h1", "h2", "h3", "h4", "h5", "h6"}
     for item_id, raw in responses.items():
-        if item_id in phq_gad_items:
+        if item_id in PHQ_GAD_ITEMS:
             # PHQ/GAD: 0-3 scale, 0=best; reverse and normalize
-            normalized = max(0, min(100, (1 - raw / 3) * 100))
-            scores.append(normalized)
-        elif item_id == "h7":
+            scores.append(normalize_inverted(raw, *PHQ_GAD_RANGE))
+        elif item_id == STRESS_ITEM:
             # Stress 1-10: lower = better
-            normalized = max(0, min(100, (1 - (raw - 1) / 9) * 100))
-            scores.append(normalized)
+            scores.append(normalize_inverted(raw, *STRESS_RANGE))
         else:
             # h8: subjective cognitive decline frequency, reverse scored
             scores.append(normalize_reverse(raw))
@@ -92,17 +103,26 @@ BENCHMARKS = {
 }
 
 
-def get_benchmark(age: Optional[int]) -> Dict[str, float]:
+def age_bracket(age: Optional[int]) -> str:
+    """Map an age onto its BENCHMARKS key (unknown age -> 30-39)."""
     if age is None:
-        return BENCHMARKS["30-39"]
+        return "30-39"
     if age < 30:
-        return BENCHMARKS["20-29"]
+        return "20-29"
     elif age < 40:
-        return BENCHMARKS["30-39"]
+        return "30-39"
     elif age < 50:
-        return BENCHMARKS["40-49"]
+        return "40-49"
     else:
-        return BENCHMARKS["50-60"]
+        return "50-60"
+
+
+def get_benchmark(age: Optional[int]) -> Dict[str, float]:
+    return BENCHMARKS[age_bracket(age)]
+
+
+def get_bracket_benchmark(bracket: str) -> Dict[str, float]:
+    return BENCHMARKS.get(bracket, BENCHMARKS["30-39"])
 
 
 def normalize_test_score_attention(avg_reaction_ms: float, correct_rate: float) -> float:
@@ -0,0 +1,39 @@
+"""
+JSON encoding for API responses (orjson).
+
+orjson writes datetimes, NumPy values and non-str dict keys itself, so
+routers can hand it the rows they read (score_to_dict keeps `date` a
+datetime) instead of building isoformat() dicts that FastAPI then walks
+again with jsonable_encoder. ORJSONResponse is the app's default response
+class; list endpoints go further and return pre-serialized bytes.
+"""
+from typing import Any, Iterable, Sequence
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+import orjson
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    # Types orjson does not know (Pydantic models, Decimal, ...)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return jsonable_encoder(obj)
+
+
+def dumps(content: Any, option: int = 0) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS | option)
+
+
+def rows_json(rows: Iterable[Sequence], fields: Sequence[str]) -> bytes:
+    """A JSON array of objects from result rows that select exactly `fields`, in that order."""
+    # zip over the row tuple is several times faster than Row attribute access
+    return dumps([dict(zip(fields, r)) for r in rows])
+
+
+def model_response(model: BaseModel, **kwargs) -> Response:
+    """An already-validated response model, serialized once (FastAPI would validate it again)."""
+    return Response(model.model_dump_json(), media_type="application/json", **kwargs)
@@ -0,0 +1,53 @@
+"""
+Production launcher: N uvicorn worker processes sharing one set of read-only tables.
+
+    cd backend && python -m serve --workers 4
+
+Before the workers start, this process publishes shared_tables (population
+totals and suggestion rules) to SHARED_TABLES_PATH, then republishes every
+SHARED_TABLES_PUBLISH_SECONDS; workers map the file and pick up each new
+generation without a restart. Edit SUGGESTIONS_PATH and run
+`python -m shared_tables --publish` (or wait for the next cycle) to roll out
+new rules. For development keep `uvicorn main:app --reload`.
+
+With more than one worker, RESPONSE_CACHE=memory is turned off (invalidation
+would only reach one worker); use RESPONSE_CACHE=redis to keep caching.
+"""
+from threading import Event, Thread
+import argparse
+import logging
+import os
+import tempfile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:     %(message)s")
+    logger = logging.getLogger("serve")
+
+    # Inherited by the spawned workers (set before shared_tables is imported here);
+    # cache.py turns the per-process response cache off with more than one worker
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    if not os.getenv("SHARED_TABLES_PATH"):
+        os.environ["SHARED_TABLES_PATH"] = os.path.join(tempfile.gettempdir(), f"pbcm_tables_{args.port}.bin")
+    import uvicorn
+    import shared_tables
+
+    generation = shared_tables.publish_once()
+    logger.info("shared tables published to %s (generation %d)", shared_tables.SHARED_TABLES_PATH, generation)
+
+    stop = Event()
+    Thread(target=shared_tables.run_publisher, args=(stop,), daemon=True, name="shared-tables").start()
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+    finally:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Read-mostly tables shared by every worker process through one mmap'd file.
+
+- population totals behind the benchmark percentiles (population_stats: n,
+  mean, M2 and the 0.5-point histogram per group and metric)
+- suggestion rules (suggestions_data.SUGGESTIONS, or the JSON list at
+  SUGGESTIONS_PATH, same shape)
+
+A publisher (the `serve` launcher, every SHARED_TABLES_PUBLISH_SECONDS, or by
+hand) builds a new file from the database and os.replace()s it over the old
+one, so readers see one whole generation or the next, never a mix. Workers map
+the file read-only: the histograms stay in the page cache, shared by all of
+them, rather than being loaded into each process. A worker picks up a new
+generation within SHARED_TABLES_CHECK_SECONDS, without restarting.
+
+    cd backend && python -m shared_tables --publish   # e.g. after editing SUGGESTIONS_PATH
+
+With SHARED_TABLES_PATH unset (a single dev process) nothing changes: tables
+come from the database and the module as before.
+
+Layout: b"PBCMTBL1", u64 header length, header JSON, zero padding to 8 bytes,
+then float64 records [n, mean, m2, hist...] per (group, metric).
+"""
+from array import array
+from threading import Event, Lock
+from typing import Dict, Optional, Tuple
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+SHARED_TABLES_PATH = os.getenv("SHARED_TABLES_PATH", "")
+SHARED_TABLES_CHECK_SECONDS = float(os.getenv("SHARED_TABLES_CHECK_SECONDS", "5"))
+SHARED_TABLES_PUBLISH_SECONDS = float(os.getenv("SHARED_TABLES_PUBLISH_SECONDS", "30"))
+SUGGESTIONS_PATH = os.getenv("SUGGESTIONS_PATH", "")
+
+MAGIC = b"PBCMTBL1"
+_PREFIX = struct.Struct("<8sQ")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+class Tables:
+    """One published generation, mapped read-only."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_len = _PREFIX.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a shared tables file")
+        header = json.loads(self._mm[_PREFIX.size:_PREFIX.size + header_len])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian host")
+        self.generation: int = header["generation"]
+        # Last population_stats snapshot included in the totals
+        self.population_seq: int = header.get("population_seq", 0)
+        self.suggestions: list = header["suggestions"]
+        self.suggestions_version: str = header["suggestions_version"]
+        self.metrics: Tuple[str, ...] = tuple(header["metrics"])
+        self._record = 3 + header["bins"]
+        self._groups = {tuple(key): i for i, key in enumerate(header["groups"])}
+        self._data = memoryview(self._mm)[_align(_PREFIX.size + header_len):].cast("d")
+
+    def population_keys(self):
+        return self._groups.keys()
+
+    def population_group(self, key: Tuple[str, str, str]) -> Optional[Dict[str, tuple]]:
+        """metric -> (n, mean, m2, histogram view) for one group, or None."""
+        i = self._groups.get(key)
+        if i is None:
+            return None
+        group = {}
+        for j, metric in enumerate(self.metrics):
+            start = (i * len(self.metrics) + j) * self._record
+            record = self._data[start:start + self._record]
+            group[metric] = (int(record[0]), record[1], record[2], record[3:])
+        return group
+
+
+_tables: Optional[Tables] = None
+_file_id = None
+_next_check = 0.0
+_lock = Lock()
+
+
+def current() -> Optional[Tables]:
+    """The newest published tables; None when sharing is off or nothing is published yet."""
+    global _tables, _file_id, _next_check
+    if not SHARED_TABLES_PATH or time.monotonic() < _next_check:
+        return _tables
+    with _lock:
+        _next_check = time.monotonic() + SHARED_TABLES_CHECK_SECONDS
+        try:
+            st = os.stat(SHARED_TABLES_PATH)
+        except FileNotFoundError:
+            return _tables
+        file_id = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if file_id != _file_id:
+            try:
+                # The previous mapping is closed once the last reader drops it
+                _tables, _file_id = Tables(SHARED_TABLES_PATH), file_id
+            except (OSError, ValueError):
+                logger.exception("could not map shared tables")
+    return _tables
+
+
+def _load_suggestions() -> list:
+    if SUGGESTIONS_PATH:
+        with open(SUGGESTIONS_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    from suggestions_data import SUGGESTIONS
+    return SUGGESTIONS
+
+
+def publish(db, path: str = SHARED_TABLES_PATH) -> int:
+    """Build the tables from the database and swap them in atomically; returns the generation."""
+    # Imported here: both modules read the tables through current()
+    from population_stats import BINS, METRICS, read_totals
+    from suggestions_data import build_index
+
+    generation = time.time_ns()
+    rules = _load_suggestions()
+    build_index(rules)  # a broken rules file fails here, not in every worker
+    totals, population_seq = read_totals(db)
+    groups = sorted(totals)
+    data = array("d")
+    for key in groups:
+        for metric in METRICS:
+            stats = totals[key][metric]
+            data.extend((stats.n, stats.mean, stats.m2))
+            data.extend(stats.hist)
+
+    rules_json = json.dumps(rules, ensure_ascii=False, sort_keys=True)
+    header = json.dumps({
+        "generation": generation,
+        "population_seq": population_seq,
+        "byteorder": sys.byteorder,
+        "metrics": METRICS,
+        "bins": BINS,
+        "groups": groups,
+        "suggestions": rules,
+        "suggestions_version": hashlib.sha1(rules_json.encode()).hexdigest(),
+    }, ensure_ascii=False).encode("utf-8")
+    prefix = _PREFIX.pack(MAGIC, len(header)) + header
+    prefix += b"\0" * (_align(len(prefix)) - len(prefix))
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        f.write(data.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return generation
+
+
+def publish_once(path: str = SHARED_TABLES_PATH) -> int:
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return publish(db, path)
+    finally:
+        db.close()
+
+
+def run_publisher(stop: Event, path: str = SHARED_TABLES_PATH) -> None:
+    """Thread target for the launcher: republish every SHARED_TABLES_PUBLISH_SECONDS until `stop`."""
+    while not stop.wait(SHARED_TABLES_PUBLISH_SECONDS):
+        try:
+            publish_once(path)
+        except Exception:
+            logger.exception("shared tables publish failed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shared read-only tables for multi-worker serving.")
+    parser.add_argument("--publish", action="store_true", help="rebuild and atomically replace the file")
+    parser.add_argument("--path", default=SHARED_TABLES_PATH)
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("set SHARED_TABLES_PATH or pass --path")
+    if args.publish:
+        publish_once(args.path)
+    tables = Tables(args.path)
+    print(f"{args.path}: generation {tables.generation}, {len(tables.population_keys())} population groups, "
+          f"{len(tables.suggestions)} suggestion rules ({tables.suggestions_version[:12]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,16 @@
 """
 Static rule-based suggestion templates for PBCM.
 Rules: pillar + score range -> advice text (ja/en).
+
+Under the multi-worker launcher the rules in use are the published ones
+(shared_tables: these, or SUGGESTIONS_PATH), so edits apply without a restart.
 """
+from bisect import bisect_left
+from functools import lru_cache
+from types import MappingProxyType
+import json
+
+import shared_tables
 
 SUGGESTIONS = [
     # --- Pillar 1: Brain Capital Drivers ---
@@ -150,29 +159,141 @@ SUGGESTIONS = [
 ]
 
 
-def get_suggestions(pillar: str, score: float, lang: str = "ja") -> dict:
-    """Get suggestions for a given pillar and score."""
-    for suggestion in SUGGESTIONS:
+_LANG_KEYS = {"ja", "en"}
+_PILLARS = ("drivers", "health", "skills")
+
+
+# Same encoding as FastAPI's JSONResponse, so fragments can be spliced into responses
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _dumps(obj) -> bytes:
+    return _encoder.encode(obj).encode("utf-8")
+
+
+def _scan(rules: list, pillar: str, score: float, lang: str):
+    """Reference linear scan over the rules: first rule whose range contains score."""
+    for suggestion in rules:
         if suggestion["pillar"] != pillar:
             continue
         score_min = suggestion.get("score_min", 0)
         score_max = suggestion.get("score_max", 100)
         if score_min <= score <= score_max:
-            return {
-                "pillar": pillar,
-                "score": score,
+            return MappingProxyType({
                 "severity": suggestion["severity"],
                 **suggestion.get(lang, suggestion.get("ja", {}))
-            }
-    return {}
+            })
+    return None
+
+
+class _Index(dict):
+    # Hashable by identity, so _fragments can memoize per index
+    __hash__ = object.__hash__
+
+
+def build_index(rules: list):
+    """(pillar, lang) -> (sorted boundaries, segment payloads).
+
+    Boundaries split the score axis into segments that are each either exactly a
+    boundary value or the open interval between two of them; every score in a
+    segment hits the same rule, so one scan per segment at import time replaces
+    the scan per request. Segment 2*i+1 is boundary i, segment 2*i is the open
+    interval just below it.
+    """
+    langs = set()
+    for suggestion in rules:
+        langs.update(k for k in suggestion if k in _LANG_KEYS)
+    index = {}
+    for pillar in {s["pillar"] for s in rules}:
+        bounds = sorted({
+            b for s in rules if s["pillar"] == pillar
+            for b in (s.get("score_min", 0), s.get("score_max", 100))
+        })
+        for lang in langs:
+            segments = []
+            for i, b in enumerate(bounds):
+                below = bounds[i - 1] if i else b - 1
+                segments.append(_scan(rules, pillar, (below + b) / 2, lang))
+                segments.append(_scan(rules, pillar, b, lang))
+            segments.append(_scan(rules, pillar, bounds[-1] + 1, lang))
+            index[(pillar, lang)] = (bounds, tuple(segments))
+    return _Index(index)
+
+
+_INDEX = build_index(SUGGESTIONS)
+_index_version = None
+
+
+def _index() -> dict:
+    """The index of the published rules when shared tables are on, else of SUGGESTIONS."""
+    global _INDEX, _index_version
+    tables = shared_tables.current()
+    if tables is not None and tables.suggestions_version != _index_version:
+        index = build_index(tables.suggestions)
+        _fragments.cache_clear()
+        _INDEX, _index_version = index, tables.suggestions_version
+    return _INDEX
+
+
+def _segment(index: dict, pillar: str, score: float, lang: str):
+    entry = index.get((pillar, lang)) or index.get((pillar, "ja"))
+    if entry is None:
+        return None, None
+    bounds, segments = entry
+    i = bisect_left(bounds, score)
+    seg = 2 * i + 1 if i < len(bounds) and bounds[i] == score else 2 * i
+    return seg, segments[seg]
+
+
+def _suggestion(index: dict, pillar: str, score: float, lang: str) -> dict:
+    _, payload = _segment(index, pillar, score, lang)
+    if payload is None:
+        return {}
+    return {"pillar": pillar, "score": score, **payload}
+
+
+def get_suggestions(pillar: str, score: float, lang: str = "ja") -> dict:
+    """Get suggestions for a given pillar and score."""
+    return _suggestion(_index(), pillar, score, lang)
 
 
 def get_all_suggestions(
     drivers: float, health: float, skills: float, lang: str = "ja"
 ) -> list:
+    index = _index()
     result = []
     for pillar, score in [("drivers", drivers), ("health", health), ("skills", skills)]:
-        s = get_suggestions(pillar, score, lang)
+        s = _suggestion(index, pillar, score, lang)
         if s:
             result.append(s)
     return result
+
+
+@lru_cache(maxsize=1024)
+def _fragments(index: _Index, segments: tuple, lang: str) -> tuple:
+    """Pre-serialized (prefix, suffix) per pillar, or None; the score goes in between."""
+    parts = []
+    for pillar, seg in zip(_PILLARS, segments):
+        payload = None if seg is None else index[(pillar, lang)][1][seg]
+        if payload is None:
+            parts.append(None)
+            continue
+        prefix = b'{"pillar":' + _dumps(pillar) + b',"score":'
+        parts.append((prefix, b"," + _dumps(dict(payload))[1:]))
+    return tuple(parts)
+
+
+def get_all_suggestions_json(
+    drivers: float, health: float, skills: float, lang: str = "ja"
+) -> bytes:
+    """get_all_suggestions() as JSON bytes, memoized per (segment triple, lang)."""
+    index = _index()
+    if ("drivers", lang) not in index:
+        lang = "ja"
+    scores = (drivers, health, skills)
+    segments = tuple(_segment(index, p, s, lang)[0] for p, s in zip(_PILLARS, scores))
+    return b"[" + b",".join(
+        part[0] + _dumps(score) + part[1]
+        for part, score in zip(_fragments(index, segments, lang), scores)
+        if part is not None
+    ) + b"]"
@@ -0,0 +1,215 @@
+"""
+Trial-level scoring for the reaction-time tests (attention, Stroop flexibility).
+
+Clients send each test's trials as two packed arrays: little-endian int16
+reaction times (-1 = no response) and uint8 flags (1 = correct, 2 = congruent
+Stroop trial), base64-encoded. They are stored as-is in test_trials (3 bytes
+per trial) and scored here with NumPy over many tests at once:
+
+- correct trials outside RT_FLOOR_MS..RT_CEILING_MS are dropped (anticipations, lapses)
+- median and IQR of the remaining RTs; Tukey fences (IQR_FENCE x IQR) trim outliers
+- the trimmed mean RT feeds the existing normalize_test_score_* functions
+- Stroop interference = median incongruent RT - median congruent RT
+
+Because the raw trials are kept, scores can be recomputed after changing the
+rules or the normalize functions:
+
+    cd backend && python -m trial_scoring --rescore [--dry-run]
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import argparse
+import base64
+import binascii
+import os
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+
+from database import SessionLocal
+from scoring import normalize_test_score_attention, normalize_test_score_flexibility
+import models
+
+RT_DTYPE = np.dtype("<i2")
+FLAG_CORRECT = 1
+FLAG_CONGRUENT = 2
+MAX_TRIALS = int(os.getenv("MAX_TEST_TRIALS", "500"))
+RT_FLOOR_MS = 100
+RT_CEILING_MS = 3000
+IQR_FENCE = 1.5
+
+# test type -> (normalize function, RT assumed when no trial was answered correctly)
+NORMALIZERS = {
+    "attention": (normalize_test_score_attention, 500.0),
+    "flexibility": (normalize_test_score_flexibility, 600.0),
+}
+
+
+def decode_trials(rt_b64: str, flags_b64: str) -> Tuple[bytes, bytes]:
+    """Validate a packed trial block; returns the raw (rt, flags) bytes to store."""
+    try:
+        rt = base64.b64decode(rt_b64, validate=True)
+        flags = base64.b64decode(flags_b64, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("invalid base64")
+    if len(rt) % RT_DTYPE.itemsize or len(rt) // RT_DTYPE.itemsize != len(flags):
+        raise ValueError("rt_ms and flags lengths differ")
+    if not 0 < len(flags) <= MAX_TRIALS:
+        raise ValueError(f"expected 1..{MAX_TRIALS} trials")
+    return rt, flags
+
+
+def _segment_quantiles(values: np.ndarray, seg: np.ndarray, n_seg: int,
+                       qs: Sequence[float]) -> np.ndarray:
+    """np.percentile (linear) of `values` within each segment; NaN for empty segments."""
+    order = np.lexsort((values, seg))
+    v = values[order].astype(np.float64)
+    counts = np.bincount(seg, minlength=n_seg)
+    starts = np.cumsum(counts) - counts
+    out = np.full((len(qs), n_seg), np.nan)
+    has = counts > 0
+    for i, q in enumerate(qs):
+        pos = q * (counts[has] - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        base = starts[has]
+        out[i, has] = v[base + lo] + (v[base + hi] - v[base + lo]) * (pos - lo)
+    return out
+
+
+def score_trials(blocks: List[Tuple[bytes, bytes]]) -> Dict[str, np.ndarray]:
+    """Summary statistics for many packed trial blocks in one vectorized pass."""
+    n_seg = len(blocks)
+    rt = np.concatenate([np.frombuffer(b[0], dtype=RT_DTYPE) for b in blocks]).astype(np.int32)
+    flags = np.concatenate([np.frombuffer(b[1], dtype=np.uint8) for b in blocks])
+    seg = np.repeat(np.arange(n_seg), [len(b[1]) for b in blocks])
+
+    n = np.bincount(seg, minlength=n_seg)
+    correct = ((flags & FLAG_CORRECT) != 0) & (rt >= 0)
+    n_correct = np.bincount(seg[correct], minlength=n_seg)
+    valid = correct & (rt >= RT_FLOOR_MS) & (rt <= RT_CEILING_MS)
+
+    q1, median, q3 = _segment_quantiles(rt[valid], seg[valid], n_seg, (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    with np.errstate(invalid="ignore"):
+        kept = (valid
+                & (rt >= (q1 - IQR_FENCE * iqr)[seg])
+                & (rt <= (q3 + IQR_FENCE * iqr)[seg]))
+    n_kept = np.bincount(seg[kept], minlength=n_seg)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(seg[kept], weights=rt[kept], minlength=n_seg) / n_kept
+
+    # Median per (test, congruent?) over the kept trials
+    congruent = (flags & FLAG_CONGRUENT) != 0
+    by_condition = _segment_quantiles(
+        rt[kept], seg[kept] * 2 + congruent[kept], 2 * n_seg, (0.5,)
+    )[0].reshape(n_seg, 2)
+
+    return {
+        "n": n,
+        "accuracy": n_correct / n,
+        "median_rt": median,
+        "iqr_rt": iqr,
+        "mean_rt": mean,
+        "trimmed": n_correct - n_kept,
+        "interference": by_condition[:, 0] - by_condition[:, 1],
+    }
+
+
+def _value(x) -> Optional[float]:
+    x = float(x)
+    return None if np.isnan(x) else round(x, 1)
+
+
+def trial_results(test_types: List[str], blocks: List[Tuple[bytes, bytes]]) -> List[Dict]:
+    """Per block: raw_score (trimmed mean RT), normalized_score and a JSON-ready stats dict."""
+    stats = score_trials(blocks)
+    results = []
+    for i, test_type in enumerate(test_types):
+        normalize, no_response_rt = NORMALIZERS[test_type]
+        mean_rt = _value(stats["mean_rt"][i])
+        raw = mean_rt if mean_rt is not None else no_response_rt
+        summary = {
+            "n": int(stats["n"][i]),
+            "accuracy": round(float(stats["accuracy"][i]), 3),
+            "median_rt": _value(stats["median_rt"][i]),
+            "iqr_rt": _value(stats["iqr_rt"][i]),
+            "mean_rt": mean_rt,
+            "trimmed": int(stats["trimmed"][i]),
+        }
+        if test_type == "flexibility":
+            summary["interference_ms"] = _value(stats["interference"][i])
+        results.append({
+            "raw_score": raw,
+            "normalized_score": normalize(raw, float(stats["accuracy"][i])),
+            "stats": summary,
+        })
+    return results
+
+
+def rescore(db, chunk_size: int = 10_000, dry_run: bool = False) -> Tuple[int, int]:
+    """Recompute every trial-backed test result; returns (scored, changed)."""
+    stmt = (
+        select(
+            models.TestTrials.test_result_id, models.TestResult.test_type,
+            models.TestTrials.rt_ms, models.TestTrials.flags,
+            models.TestResult.raw_score, models.TestResult.normalized_score,
+        )
+        .join(models.TestResult, models.TestResult.id == models.TestTrials.test_result_id)
+        .order_by(models.TestTrials.test_result_id)
+        .limit(chunk_size)
+    )
+    scored = changed = 0
+    last_id = 0
+    # Keyset chunks rather than one long cursor, so each chunk can commit on its own
+    while True:
+        rows = db.execute(stmt.where(models.TestTrials.test_result_id > last_id)).all()
+        if not rows:
+            break
+        last_id = rows[-1].test_result_id
+        results = trial_results([r.test_type for r in rows], [(r.rt_ms, r.flags) for r in rows])
+        updates = [
+            {"rid": r.test_result_id, "raw": res["raw_score"], "norm": res["normalized_score"], "stats": res["stats"]}
+            for r, res in zip(rows, results)
+        ]
+        scored += len(rows)
+        changed += sum(
+            1 for r, res in zip(rows, results)
+            if (r.raw_score, r.normalized_score) != (res["raw_score"], res["normalized_score"])
+        )
+        if dry_run:
+            continue
+        db.connection().execute(
+            update(models.TestResult.__table__)
+            .where(models.TestResult.__table__.c.id == bindparam("rid"))
+            .values(raw_score=bindparam("raw"), normalized_score=bindparam("norm")),
+            updates,
+        )
+        db.connection().execute(
+            update(models.TestTrials.__table__)
+            .where(models.TestTrials.__table__.c.test_result_id == bindparam("rid"))
+            .values(stats=bindparam("stats")),
+            updates,
+        )
+        db.commit()
+    return scored, changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Trial-level test scoring maintenance.")
+    parser.add_argument("--rescore", action="store_true", help="recompute scores from stored trials")
+    parser.add_argument("--dry-run", action="store_true", help="report changes without writing")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+    if not args.rescore:
+        parser.print_help()
+        return
+    db = SessionLocal()
+    try:
+        scored, changed = rescore(db, args.chunk_size, args.dry_run)
+    finally:
+        db.close()
+    print(f"scored {scored:,} test results, {changed:,} changed{' (dry run)' if args.dry_run else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { useAuthStore } from '../store/authStore'
-import { testApi } from '../utils/api'
+import { testApi, packTrials } from '../utils/api'
 import { getTranslations } from '../i18n'
 import Layout from '../components/Layout'
 import clsx from 'clsx'
@@ -266,37 +266,25 @@ export default function CognitiveTest() {
   const submitResults = useCallback(async () => {
     setSubmitting(true)
     try {
-      // Calculate averages
-      const attCorrect = attTrials.filter((t) => t.correct)
-      const attAvgRT = attCorrect.length > 0
-        ? attCorrect.reduce((s, t) => s + t.reactionTime, 0) / attCorrect.length
-        : 500
-
+      // Send every trial; the server trims outliers and scores them
       const memCorrect = memRounds.filter((r) => r.correct).length
 
-      const stroopCorrect = stroopTrials.filter((t) => t.correct)
-      const stroopAvgRT = stroopCorrect.length > 0
-        ? stroopCorrect.reduce((s, t) => s + t.reactionTime, 0) / stroopCorrect.length
-        : 600
-
       const payload = {
-        attention: {
-          avg_reaction_ms: attAvgRT,
-          correct_rate: attTrials.filter((t) => t.correct).length / ATTENTION_TRIALS,
-          total_trials: ATTENTION_TRIALS,
-        },
+        attention: packTrials(
+          attTrials.map((t) => (t.responded ? t.reactionTime : -1)),
+          attTrials.map((t) => (t.correct ? 1 : 0)),
+        ),
         memory: {
           correct_count: memCorrect,
           total_trials: MEMORY_ROUNDS,
         },
-        flexibility: {
-          avg_reaction_ms: stroopAvgRT,
-          correct_rate: stroopTrials.filter((t) => t.correct).length / STROOP_TRIALS,
-          total_trials: STROOP_TRIALS,
-        },
+        flexibility: packTrials(
+          stroopTrials.map((t) => (t.responded ? t.reactionTime : -1)),
+          stroopTrials.map((t) => (t.correct ? 1 : 0) | (t.word === t.displayColor ? 2 : 0)),
+        ),
       }
 
-      const res = await testApi.submit(payload)
+      const res = await testApi.submitTrials(payload)
       setResults(res.data)
       setPhase('result')
     } catch {
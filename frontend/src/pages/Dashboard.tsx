@@ -6,7 +6,7 @@ import {
   BarChart, Bar, Cell,
 } from 'recharts'
 import { useAuthStore } from '../store/authStore'
-import { surveyApi } from '../utils/api'
+import { dashboardApi } from '../utils/api'
 import { getTranslations } from '../i18n'
 import Layout from '../components/Layout'
 import ScoreGauge from '../components/ScoreGauge'
@@ -39,14 +39,10 @@ export default function Dashboard() {
   useEffect(() => {
     const load = async () => {
       try {
-        const [latestRes, historyRes, baselineRes] = await Promise.all([
-          surveyApi.getLatest(),
-          surveyApi.getHistory(12),
-          surveyApi.hasBaseline(),
-        ])
-        setLatest(latestRes.data)
-        setHistory(historyRes.data)
-        setHasBaseline(baselineRes.data.has_baseline)
+        const res = await dashboardApi.get(12)
+        setLatest(res.data.latest)
+        setHistory(res.data.history)
+        setHasBaseline(res.data.has_baseline)
       } catch {
         // no data yet
       } finally {
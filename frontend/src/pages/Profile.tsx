@@ -16,13 +16,19 @@ export default function Profile() {
 
   const handleSave = async () => {
     try {
-      await api.put('/auth/profile', null, {
+      const res = await api.put('/auth/profile', null, {
         params: {
           age: age ? parseInt(age) : undefined,
           gender: gender || undefined,
           language: lang,
         }
       })
+      if (user) {
+        setAuth(
+          { ...user, age: age ? parseInt(age) : user.age, gender: gender || user.gender, language: lang },
+          res.data.access_token
+        )
+      }
       setSaved(true)
       setTimeout(() => setSaved(false), 2000)
     } catch {
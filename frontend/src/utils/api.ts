@@ -28,6 +28,13 @@ api.interceptors.response.use(
       useAuthStore.getState().logout()
       window.location.href = '/login'
     }
+    // 429 (リクエスト過多) / 503 (混雑): すぐに再送せず Retry-After 秒待つよう案内
+    const status = error.response?.status
+    if (status === 429 || status === 503) {
+      const retryAfter = Number(error.response.headers['retry-after']) || 5
+      error.retryAfter = retryAfter
+      error.friendlyMessage = `混み合っています。${retryAfter}秒ほど待ってから再度お試しください`
+    }
     // ネットワーク到達不能 or タイムアウト時に分かりやすいエラーを付与
     if (!error.response) {
       const isTimeout = error.code === 'ECONNABORTED'
@@ -77,11 +84,36 @@ export const surveyApi = {
 
   getHistory: (limit?: number) => api.get('/surveys/history', { params: { limit } }),
 
+  // Fixed-size chart series: LTTB-picked scores (points) or min/mean/max per bucket
+  getHistorySeries: (params: {
+    start?: string
+    end?: string
+    points?: number
+    bucket?: 'week' | 'month' | 'auto'
+  }) => api.get('/surveys/history', { params }),
+
   getLatest: () => api.get('/surveys/latest'),
 
   hasBaseline: () => api.get('/surveys/has-baseline'),
 }
 
+// Dashboard (latest + history + baseline flag + suggestions in one request)
+export const dashboardApi = {
+  get: (limit?: number) => api.get('/dashboard', { params: { limit } }),
+}
+
+// Per-trial arrays packed as base64: little-endian int16 reaction times (-1 = no response)
+// and uint8 flags (1 = correct, 2 = congruent Stroop trial)
+export type TrialBlock = { rt_ms: string; flags: string }
+
+const toBase64 = (bytes: Uint8Array) => btoa(String.fromCharCode(...bytes))
+
+export const packTrials = (reactionTimes: number[], flags: number[]): TrialBlock => {
+  const view = new DataView(new ArrayBuffer(reactionTimes.length * 2))
+  reactionTimes.forEach((rt, i) => view.setInt16(i * 2, Math.max(-1, Math.min(32767, Math.round(rt))), true))
+  return { rt_ms: toBase64(new Uint8Array(view.buffer)), flags: toBase64(Uint8Array.from(flags)) }
+}
+
 // Cognitive Tests
 export const testApi = {
   submit: (data: {
@@ -91,6 +123,13 @@ export const testApi = {
     skills_survey?: Record<string, number>
   }) => api.post('/tests/submit', data),
 
+  submitTrials: (data: {
+    attention?: TrialBlock
+    memory?: { correct_count: number; total_trials: number }
+    flexibility?: TrialBlock
+    skills_survey?: Record<string, number>
+  }) => api.post('/tests/submit-trials', data),
+
   getHistory: () => api.get('/tests/history'),
 }
 
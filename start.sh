@@ -27,10 +27,15 @@ fi
 source .venv/bin/activate
 pip install -q -r requirements.txt
 echo "  Backend dependencies installed."
+python -m migrate
 
-# Start backend in background
+# Start backend in background (build: multi-worker launcher, WEB_CONCURRENCY workers; dev: auto-reload)
 echo "[2/4] Starting FastAPI backend on port 8000..."
-uvicorn main:app --host 0.0.0.0 --port 8000 --reload &
+if [ "$1" = "build" ]; then
+    python -m serve --host 0.0.0.0 --port 8000 &
+else
+    uvicorn main:app --host 0.0.0.0 --port 8000 --reload &
+fi
 BACKEND_PID=$!
 echo "  Backend PID: $BACKEND_PID"
 sleep 2